@@ -0,0 +1,153 @@
+"""Cek regresi solver tcl di core PMV (4 langkah Newton ter-unroll).
+
+Jalankan setelah mengubah rumus PMV atau solver tcl:
+    python check_pmv_solver.py
+
+Dua pemeriksaan:
+1. Konvergensi: _pmv_core_py (4 langkah Newton) harus sama dengan referensi
+   Newton 40 langkah setelah dibulatkan ke 2 desimal, di grid Ta/RH untuk
+   beberapa kombinasi vel/met/clo.
+2. Perbandingan dengan iterasi fixed-point lama (maks 100 iterasi, toleransi
+   0.001) pada asumsi DEFAULT_* dan grid suhu 15.0-36.0°C (0.1) x RH 10-99%.
+   Selisih PMV yang dipublikasi dibatasi (MAX_PMV_DELTA, MAX_PMV_DELTA_CORE) dan
+   jumlah perubahan PMV/status/severity dicetak agar bisa dibandingkan dengan
+   angka di commit solver Newton (3744 pasangan PMV, 12 status, 11 severity).
+
+Status tidak bergantung pada occupancy selain 0 (Boros Energi), jadi grid
+dihitung dengan occupancy 1.
+"""
+import math
+from collections import Counter
+
+import rule_engine
+from rule_engine import (
+    DEFAULT_AIR_VELOCITY,
+    DEFAULT_CLOTHING_INSULATION,
+    DEFAULT_MEAN_RADIANT_TEMP_OFFSET,
+    DEFAULT_METABOLIC_RATE,
+    SEVERITY_NAMES,
+    STATUS_NAMES,
+)
+
+
+# Batas selisih PMV (dipublikasi, 2 desimal) antara fixed-point lama dan Newton
+MAX_PMV_DELTA = 0.09        # Seluruh grid (terbesar dekat clamp -3)
+MAX_PMV_DELTA_CORE = 0.04   # Untuk |PMV| < 2.5
+NEWTON_REFERENCE_STEPS = 40
+
+# Kombinasi (vel, met, clo) untuk cek konvergensi, termasuk yang membuat loop lama overflow
+CONVERGENCE_CASES = (
+    (0.05, 1.0, 0.5), (0.1, 1.0, 0.5), (0.05, 1.2, 0.5), (0.1, 1.2, 0.5),
+    (0.05, 1.0, 0.3), (0.1, 1.0, 0.3), (0.3, 1.0, 0.3), (0.2, 1.6, 1.0),
+)
+
+
+def _pmv_from_tcl(ta, tr, vel, rh, met, clo, solve_tcl):
+    """Rumus Fanger dengan solver tcl yang bisa diganti (float mentah)."""
+    M = met * 58.15
+    fcl = 1.0 + 1.290 * clo if clo <= 0.078 else 1.05 + 0.645 * clo
+    Icl = clo * 0.155
+    pa = rh * 10 * math.exp(16.6536 - 4030.183 / (ta + 235))
+    hc = max(2.38 * abs(35.7 - 0.028 * M - ta) ** 0.25, 12.1 * math.sqrt(vel))
+    
+    tcl = solve_tcl(35.7 - 0.028 * M, Icl, 3.96e-8 * fcl, fcl * hc, ta, (tr + 273) ** 4)
+    
+    HL1 = 3.05e-3 * (5733 - 6.99 * M - pa)
+    HL2 = 0.42 * (M - 58.15) if M > 58.15 else 0.0
+    HL3 = 1.7e-5 * M * (5867 - pa)
+    HL4 = 0.0014 * M * (34 - ta)
+    HL5 = 3.96e-8 * fcl * ((tcl + 273) ** 4 - (tr + 273) ** 4)
+    HL6 = fcl * hc * (tcl - ta)
+    L = M - HL1 - HL2 - HL3 - HL4 - HL5 - HL6
+    return (0.303 * math.exp(-0.036 * M) + 0.028) * L
+
+
+def _tcl_fixed_point(base, Icl, K, conv, ta, tr4):
+    """Solver tcl lama (sebelum Newton): iterasi fixed-point, maks 100 iterasi."""
+    tcl = base
+    for _ in range(100):
+        tcl_old = tcl
+        tcl = base - Icl * (K * ((tcl + 273) ** 4 - tr4) + conv * (tcl - ta))
+        if abs(tcl - tcl_old) < 0.001:
+            break
+    return tcl
+
+
+def _tcl_newton_reference(base, Icl, K, conv, ta, tr4):
+    """Referensi: Newton dengan NEWTON_REFERENCE_STEPS langkah (konvergen penuh)."""
+    tcl = base
+    for _ in range(NEWTON_REFERENCE_STEPS):
+        tk = tcl + 273
+        tcl -= (tcl - base + Icl * (K * (tk ** 4 - tr4) + conv * (tcl - ta))) / (1 + Icl * (4 * K * tk ** 3 + conv))
+    return tcl
+
+
+def _published(pmv_raw):
+    """(pmv, ppd, status, severity) seperti yang dipublikasi _evaluate_core (occupancy 1)."""
+    pmv = round(max(-3.0, min(3.0, pmv_raw)), 2)
+    ppd, severity = rule_engine._pmv_derivatives(pmv)
+    ppd = round(ppd, 1)
+    status = STATUS_NAMES[rule_engine.get_status_code_from_ppd(ppd, 1)]
+    return pmv, ppd, status, SEVERITY_NAMES[severity]
+
+
+def check_convergence():
+    """_pmv_core_py (4 langkah) == referensi Newton 40 langkah setelah pembulatan."""
+    mismatches = total = 0
+    for i in range(301):
+        ta = 10 + i * 0.1
+        for rh in range(0, 101, 5):
+            for vel, met, clo in CONVERGENCE_CASES:
+                total += 1
+                unrolled = round(rule_engine._pmv_core_py(ta, ta, vel, rh, met, clo), 2)
+                reference = round(_pmv_from_tcl(ta, ta, vel, rh, met, clo, _tcl_newton_reference), 2)
+                if unrolled != reference:
+                    mismatches += 1
+                    print(f"  mismatch ta={ta:.1f} rh={rh} vel={vel} met={met} clo={clo}: "
+                          f"{unrolled} vs {reference}")
+    print(f"Konvergensi: {mismatches} selisih dari {total} titik")
+    assert mismatches == 0
+
+
+def check_against_fixed_point():
+    """Bandingkan output yang dipublikasi: fixed-point lama vs Newton (asumsi DEFAULT_*)."""
+    pmv_changes = 0
+    max_delta = max_delta_core = 0.0
+    state_changes = Counter()
+    severity_changes = Counter()
+    for i in range(211):
+        ta = round(15.0 + i * 0.1, 1)
+        for rh in range(10, 100):
+            old = _published(_pmv_from_tcl(
+                ta, ta + DEFAULT_MEAN_RADIANT_TEMP_OFFSET, DEFAULT_AIR_VELOCITY, rh,
+                DEFAULT_METABOLIC_RATE, DEFAULT_CLOTHING_INSULATION, _tcl_fixed_point
+            ))
+            new = _published(rule_engine.calculate_pmv_default(ta, rh))
+            
+            delta = abs(new[0] - old[0])
+            if delta:
+                pmv_changes += 1
+                max_delta = max(max_delta, delta)
+                if abs(new[0]) < 2.5:
+                    max_delta_core = max(max_delta_core, delta)
+            if new[2] != old[2]:
+                state_changes[old[2], new[2]] += 1
+            if new[3] != old[3]:
+                severity_changes[old[3], new[3]] += 1
+    
+    print(f"PMV berubah di {pmv_changes} dari 18990 pasangan Ta/RH "
+          f"(maks {max_delta:.2f}, maks {max_delta_core:.2f} untuk |PMV| < 2.5)")
+    print(f"Status berubah di {sum(state_changes.values())} pasangan:")
+    for (old_state, new_state), count in sorted(state_changes.items()):
+        print(f"  {old_state} -> {new_state}: {count}")
+    print(f"Severity berubah di {sum(severity_changes.values())} pasangan:")
+    for (old_severity, new_severity), count in sorted(severity_changes.items()):
+        print(f"  {old_severity} -> {new_severity}: {count}")
+    
+    assert round(max_delta, 2) <= MAX_PMV_DELTA
+    assert round(max_delta_core, 2) <= MAX_PMV_DELTA_CORE
+
+
+if __name__ == "__main__":
+    check_convergence()
+    check_against_fixed_point()
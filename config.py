@@ -0,0 +1,72 @@
+"""Konfigurasi aplikasi dari environment variables (.env).
+
+Semua setting dibaca SEKALI melalui get_config() dan disimpan dalam objek
+Config yang immutable, sehingga main.py dan LLMService memakai sumber yang sama.
+"""
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+
+
+# Status dengan narasi deterministik: fallback template dipakai langsung tanpa LLM
+DEFAULT_LLM_SKIP_STATES = ("Boros Energi", "Ideal")
+
+
+def _split_csv(value: str) -> Tuple[str, ...]:
+    """Pecah string comma-separated menjadi tuple (item kosong dibuang)."""
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+
+@dataclass(frozen=True)
+class Config:
+    """Setting aplikasi (MQTT + LLM + logging)."""
+    # MQTT
+    mqtt_broker: str
+    mqtt_port: int
+    mqtt_username: Optional[str]
+    mqtt_password: Optional[str]
+    mqtt_topics_input: Tuple[str, ...]   # Mendukung wildcard seperti topic/#
+    mqtt_base_topics: Tuple[str, ...]    # Topic tanpa wildcard, untuk penyimpanan data
+    mqtt_topic_output: str
+    fetch_interval: int                  # seconds
+    data_collection_time: int            # max seconds to wait for fresh data
+    # LLM
+    llm_mode: str
+    llm_endpoint: str
+    llm_api_key: Optional[str]
+    llm_model: str
+    llm_cache_dir: str                   # Kosong = persistent cache nonaktif
+    llm_cache_ttl: int                   # seconds; 0 = entry disk cache tidak kedaluwarsa
+    llm_skip_states: Tuple[str, ...]
+    # Logging
+    log_level: str                       # DEBUG menampilkan payload lengkap
+
+
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    """Baca .env dan environment variables sekali, lalu cache hasilnya."""
+    load_dotenv()
+
+    topics_input = _split_csv(os.getenv("MQTT_TOPIC_INPUT", ""))
+
+    return Config(
+        mqtt_broker=os.getenv("MQTT_BROKER", "localhost"),
+        mqtt_port=int(os.getenv("MQTT_PORT", 1883)),
+        mqtt_username=os.getenv("MQTT_USERNAME", None),
+        mqtt_password=os.getenv("MQTT_PASSWORD", None),
+        mqtt_topics_input=topics_input,
+        mqtt_base_topics=tuple(topic.replace("/#", "").replace("/*", "") for topic in topics_input),
+        mqtt_topic_output=os.getenv("MQTT_TOPIC_OUTPUT", "response_LLM"),
+        fetch_interval=int(os.getenv("FETCH_INTERVAL", 60)),
+        data_collection_time=int(os.getenv("DATA_COLLECTION_TIME", 5)),
+        llm_mode=os.getenv("LLM_MODE", "ollama").lower(),
+        llm_endpoint=os.getenv("LLM_ENDPOINT", "http://localhost:11434/api/generate"),
+        llm_api_key=os.getenv("LLM_API_KEY"),
+        llm_model=os.getenv("LLM_MODEL", "llama3.2"),
+        llm_cache_dir=os.getenv("LLM_CACHE_DIR", ".reason_cache"),
+        llm_cache_ttl=int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600)),
+        llm_skip_states=_split_csv(os.getenv("LLM_SKIP_STATES", ",".join(DEFAULT_LLM_SKIP_STATES))),
+        log_level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    )
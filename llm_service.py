@@ -8,15 +8,24 @@ Versi ISO 7730 dengan perbaikan:
 - Model constraints dijelaskan sebagai batasan, bukan fakta absolut
 - History-aware: menggunakan data eksekusi sebelumnya untuk konteks
 """
-import os
-import json
+import re
+import hashlib
+import logging
+import threading
+import bisect
+import orjson
 import requests
+import diskcache
 from datetime import datetime
-from collections import deque
-from typing import Optional, List
+from string import Formatter
+from collections import deque, OrderedDict
+from typing import Callable, Optional, List, Tuple
+from config import get_config
 from models import SensorData, HistoryEntry, ACControl
 from rule_engine import RuleResult, EnvIssue
 
+logger = logging.getLogger(__name__)
+
 
 # PMV interpretation (ISO 7730)
 PMV_SCALE = {
@@ -30,22 +39,381 @@ PMV_SCALE = {
 }
 
 
+# Batas generate: narasi 3-5 kalimat ≈ 80-140 token
+REASON_MAX_TOKENS = 180
+# Stop sequence setelah JSON {"reason": ...} selesai. Bukan "```" karena model
+# sering MEMBUKA jawaban dengan code fence (output akan kosong).
+_REASON_STOP = ["\n}", "\n\n\n"]
+# Setelah reason lengkap, sisa stream (biasanya 1-2 token + chunk "done") tetap
+# dibaca sampai habis agar koneksi kembali ke pool keep-alive Session. Jika model
+# masih terus generate lebih dari batas ini, stream diputus (koneksi dibuang).
+_STREAM_TAIL_CHUNKS = 8
+
+# Parsing response LLM (dikompilasi sekali saat import)
+_JSON_FENCE_RE = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+_REASON_RE = re.compile(r'"reason"\s*:\s*"((?:[^"\\]|\\.)*)"', re.DOTALL)
+
+
+# Batas atas (inklusif) setiap label sensasi termal, lihat get_pmv_description
+_PMV_THRESHOLDS = (-2.5, -1.5, -0.5, 0.5, 1.5, 2.5)
+_PMV_LABELS = (
+    "sangat dingin",
+    "dingin",
+    "agak dingin",
+    "netral/nyaman",
+    "agak hangat",
+    "hangat",
+    "panas",
+)
+
+
 def get_pmv_description(pmv: float) -> str:
     """Dapatkan deskripsi sensasi termal dari PMV."""
-    if pmv <= -2.5:
-        return "sangat dingin"
-    elif pmv <= -1.5:
-        return "dingin"
-    elif pmv <= -0.5:
-        return "agak dingin"
-    elif pmv <= 0.5:
-        return "netral/nyaman"
-    elif pmv <= 1.5:
-        return "agak hangat"
-    elif pmv <= 2.5:
-        return "hangat"
-    else:
-        return "panas"
+    return _PMV_LABELS[bisect.bisect_left(_PMV_THRESHOLDS, pmv)]
+
+
+# ============================================================================
+# PROMPT CONSTANTS - Bagian STATIS prompt (dibangun sekali saat import)
+# ============================================================================
+# Panduan fokus narasi per primary_concern
+_FOCUS_GUIDANCE = {
+    "environmental": """Masalah UTAMA adalah LINGKUNGAN (bukan termal).
+- Soroti masalah non-termal (noise/lighting/humidity) sebagai penyebab utama ketidaknyamanan
+- AC tetap disebutkan tapi bukan fokus utama
+- Berikan saran untuk faktor non-termal""",
+    "both": """Ada masalah GANDA (termal DAN lingkungan).
+- Jelaskan kedua aspek secara seimbang
+- Prioritaskan yang lebih parah
+- Berikan rekomendasi komprehensif""",
+    "thermal": """Masalah UTAMA adalah TERMAL.
+- Fokus pada PMV dan koreksi AC
+- Lingkungan non-termal dalam kondisi baik""",
+    "none": """Kondisi OPTIMAL.
+- Jelaskan mengapa kondisi sudah ideal
+- Sarankan untuk mempertahankan pengaturan""",
+}
+
+# Narrative guardrails per status
+_GUARDRAIL = {
+    "Optimalisasi": """GUARDRAIL NARASI (WAJIB untuk status Optimalisasi):
+⚠️ KATA YANG DILARANG (jangan gunakan!):
+  ✘ "koreksi signifikan"
+  ✘ "penyesuaian agresif" 
+  ✘ "drastis"
+  ✘ "perubahan besar"
+
+✅ KATA YANG WAJIB digunakan:
+  ✔ "preventif"
+  ✔ "ringan"
+  ✔ "bertahap"
+  ✔ "halus"
+  ✔ "penyesuaian kecil\"""",
+    "Ideal": """GUARDRAIL NARASI (untuk status Ideal):
+Tekankan bahwa kondisi sudah OPTIMAL dan tidak perlu tindakan.
+Gunakan kata: "pertahankan", "optimal", "nyaman", "seimbang\"""",
+}
+
+# Deskripsi thermal severity
+_SEVERITY_DESC = {
+    "none": "dalam zona netral",
+    "mild": "sedikit di luar zona nyaman (mild)",
+    "moderate": "tidak nyaman (moderate)",
+    "severe": "sangat tidak nyaman (severe)",
+}
+
+_PMV_SCALE_TEXT = "\n".join(f"  {pmv:+d} → {desc}" for pmv, desc in PMV_SCALE.items())
+
+# Diletakkan di DEPAN dan identik antar request sehingga provider LLM dapat
+# memakai ulang prefix yang sudah di-cache. Data sensor (dinamis) dikirim
+# terpisah sebagai pesan user oleh LLMService._build_prompt.
+SYSTEM_PROMPT = f"""Kamu adalah asisten analisis kenyamanan ruangan berbasis standar ISO 7730.
+
+══════════════════════════════════════════════════════════════════
+KONSEP ISO 7730:
+══════════════════════════════════════════════════════════════════
+• PMV (Predicted Mean Vote) adalah skala sensasi termal:
+{_PMV_SCALE_TEXT}
+• PPD (Predicted Percentage Dissatisfied) adalah persentase penghuni yang
+  diperkirakan tidak nyaman. Hubungan PMV-PPD adalah EKSPONENSIAL (bukan linear!)
+• Status Kenyamanan Fisiologis ditentukan dari PPD.
+• Skor Lingkungan (pencahayaan, kebisingan, kelembapan) TERPISAH dari status.
+• Koreksi AC: trajectory-centric (dari target, bukan dari suhu aktual)
+
+══════════════════════════════════════════════════════════════════
+PANDUAN FOKUS NARASI (sesuai nilai FOKUS NARASI pada data):
+══════════════════════════════════════════════════════════════════
+""" + "\n".join(f"[{concern}] {text}" for concern, text in _FOCUS_GUIDANCE.items()) + """
+
+══════════════════════════════════════════════════════════════════
+""" + "\n\n".join(_GUARDRAIL.values()) + """
+══════════════════════════════════════════════════════════════════
+
+TUGAS: Buat narasi 3-5 kalimat yang:
+1. Menjelaskan kondisi dengan alur sebab-akibat
+2. Mengikuti GUARDRAIL NARASI sesuai status
+3. Menyertakan KALIMAT WAJIB jika ada
+4. Konsisten dengan status kenyamanan pada data
+5. Jika ada history, pertimbangkan trend dan perubahan dari eksekusi sebelumnya
+
+FORMAT OUTPUT (JSON):
+{"reason": "<narasi 3-5 kalimat>"}"""
+
+# Kalimat wajib jika env_score tinggi tapi status bukan Ideal
+_SCORE_STATUS_TEMPLATE = """KALIMAT WAJIB DALAM NARASI:
+══════════════════════════════════════════════════════════════════
+Karena env_score ({score}%) tinggi tapi status "{state}",
+TAMBAHKAN kalimat edukatif seperti:
+"Meskipun kualitas lingkungan non-termal sangat baik (skor {score}%), 
+status ditentukan oleh kenyamanan fisiologis tubuh (PPD), bukan oleh skor lingkungan."
+══════════════════════════════════════════════════════════════════"""
+
+_NO_ENV_ISSUES_TEXT = "  Tidak ada masalah lingkungan signifikan."
+
+# Template data satu kondisi ruangan (dipecah sekali oleh _compile_prompt_template)
+_DATA_SECTION_TEMPLATE = """══════════════════════════════════════════════════════════════════
+DATA SENSOR AKTUAL:
+══════════════════════════════════════════════════════════════════
+• Suhu udara (Ta): {data.temp}°C
+• Kelembapan (RH): {data.hum}%
+• Kebisingan: {data.noise} dB
+• Pencahayaan: {data.light_level} lux
+• Jumlah penghuni: {data.occupancy} orang
+
+══════════════════════════════════════════════════════════════════
+HASIL ANALISIS KENYAMANAN TERMAL (ISO 7730):
+══════════════════════════════════════════════════════════════════
+• PMV (Predicted Mean Vote): {result.comfort.pmv}
+  → Sensasi termal: {pmv_desc}
+  → Tingkat keparahan: {severity_desc}
+
+• PPD (Predicted Percentage Dissatisfied): {result.comfort.ppd}%
+  → Artinya: {result.comfort.ppd}% penghuni diperkirakan tidak nyaman
+
+• Status Kenyamanan Fisiologis: {result.comfort.state}
+  → Target temp: {result.target_temp}°C
+
+══════════════════════════════════════════════════════════════════
+KUALITAS LINGKUNGAN (NON-TERMAL):
+══════════════════════════════════════════════════════════════════
+• Skor Lingkungan: {result.env_score}/100
+• Detail: Pencahayaan {breakdown[lighting]}/100, 
+         Kebisingan {breakdown[noise]}/100,
+         Kelembapan {breakdown[humidity]}/100
+
+• Masalah Lingkungan Terdeteksi:
+{env_issues_text}
+
+══════════════════════════════════════════════════════════════════
+KEPUTUSAN KONTROL AC:
+══════════════════════════════════════════════════════════════════
+• Setpoint: {result.ac_control.temp}°C (dari target {result.target_temp}°C)
+• Mode: {result.ac_control.mode}
+• Fan: {result.ac_control.fan}
+
+══════════════════════════════════════════════════════════════════
+FOKUS NARASI: {result.primary_concern}
+GUARDRAIL NARASI: status "{result.comfort.state}"
+══════════════════════════════════════════════════════════════════
+
+{score_status_explanation}"""
+
+
+def _env_issues_text(result: RuleResult) -> str:
+    """Daftar masalah lingkungan untuk prompt."""
+    if not result.env_issues:
+        return _NO_ENV_ISSUES_TEXT
+    return "\n".join(
+        f"  - [{issue.severity.upper()}] {issue.description}\n    → Saran: {issue.recommendation}"
+        for issue in result.env_issues
+    )
+
+
+def _score_status_explanation(result: RuleResult) -> str:
+    """MANDATORY: Penjelasan Score vs Status jika berbeda persepsi."""
+    if result.env_score >= 80 and result.comfort.state in ("Optimalisasi", "Peringatan"):
+        return _SCORE_STATUS_TEMPLATE.format(score=result.env_score, state=result.comfort.state)
+    return ""
+
+
+# Accessor per placeholder di _DATA_SECTION_TEMPLATE: (data, result) -> nilai
+_PROMPT_FIELD_GETTERS = {
+    "data.temp": lambda d, r: d.temp,
+    "data.hum": lambda d, r: d.hum,
+    "data.noise": lambda d, r: d.noise,
+    "data.light_level": lambda d, r: d.light_level,
+    "data.occupancy": lambda d, r: d.occupancy,
+    "result.comfort.pmv": lambda d, r: r.comfort.pmv,
+    "result.comfort.ppd": lambda d, r: r.comfort.ppd,
+    "result.comfort.state": lambda d, r: r.comfort.state,
+    "result.target_temp": lambda d, r: r.target_temp,
+    "result.env_score": lambda d, r: r.env_score,
+    "result.ac_control.temp": lambda d, r: r.ac_control.temp,
+    "result.ac_control.mode": lambda d, r: r.ac_control.mode,
+    "result.ac_control.fan": lambda d, r: r.ac_control.fan,
+    "result.primary_concern": lambda d, r: r.primary_concern,
+    "breakdown[lighting]": lambda d, r: r.env_score_breakdown["lighting"],
+    "breakdown[noise]": lambda d, r: r.env_score_breakdown["noise"],
+    "breakdown[humidity]": lambda d, r: r.env_score_breakdown["humidity"],
+    "pmv_desc": lambda d, r: get_pmv_description(r.comfort.pmv),
+    "severity_desc": lambda d, r: _SEVERITY_DESC.get(r.thermal_severity, "unknown"),
+    "env_issues_text": lambda d, r: _env_issues_text(r),
+    "score_status_explanation": lambda d, r: _score_status_explanation(r),
+}
+
+
+def _compile_prompt_template(
+    template: str
+) -> Tuple[Tuple[str, ...], Tuple[Callable[[SensorData, RuleResult], object], ...]]:
+    """Pecah template menjadi segmen konstan + accessor field (sekali saat import).
+    
+    Hasil: len(parts) == len(fields) + 1, sehingga prompt = parts[0] + field[0] + parts[1] + ...
+    tanpa parsing format spec setiap kali prompt dibangun.
+    """
+    parts, fields = [], []
+    for literal, field_name, _spec, _conv in Formatter().parse(template):
+        parts.append(literal)
+        if field_name is not None:
+            fields.append(_PROMPT_FIELD_GETTERS[field_name])
+    if len(parts) == len(fields):
+        parts.append("")
+    return tuple(parts), tuple(fields)
+
+
+_PROMPT_PARTS, _PROMPT_FIELDS = _compile_prompt_template(_DATA_SECTION_TEMPLATE)
+
+
+# ============================================================================
+# FALLBACK TEMPLATES - Narasi deterministik jika LLM dilewati/gagal
+# ============================================================================
+# Key: status, (primary_concern, "*"), atau arah PMV. Diisi dengan str.format
+# oleh LLMService._generate_fallback_reason.
+_FALLBACK_TEMPLATES = {
+    # ===== Status Boros Energi (ruangan kosong) =====
+    "Boros Energi": (
+        "Ruangan kosong (occupancy: 0) sehingga tidak ada kebutuhan kenyamanan termal. "
+        "AC dimatikan (mode: off) untuk efisiensi energi. "
+        "Sistem akan aktif kembali saat terdeteksi penghuni."
+    ),
+    # ===== Context-Aware: Masalah ENVIRONMENTAL sebagai fokus utama =====
+    ("environmental", "*"): (
+        "Kondisi termal dalam zona {pmv_desc} (PMV = {pmv}, PPD = {ppd}%). "
+        "Namun, masalah utama adalah {issue.factor}: {issue.description}. "
+        "Saran: {issue.recommendation}. "
+        "AC tetap pada {ac.temp}°C mode {ac.mode} "
+        "untuk mempertahankan kenyamanan termal."
+    ),
+    # ===== Context-Aware: Masalah GANDA (termal + environmental) =====
+    ("both", "*"): (
+        "Terdeteksi masalah ganda: (1) Sensasi {pmv_desc} (PMV = {pmv}) dengan {ppd}% penghuni tidak nyaman, "
+        "dan (2) {issue.description}. "
+        "Untuk aspek termal, AC disetel ke {ac.temp}°C mode {ac.mode}. "
+        "Untuk {issue.factor}, disarankan: {issue.recommendation}."
+    ),
+    # ===== Status Ideal (kondisi optimal) =====
+    "Ideal": (
+        "Kondisi ruangan optimal dengan PMV = {pmv} (sensasi {pmv_desc}). "
+        "Hanya {ppd}% penghuni diperkirakan tidak nyaman berdasarkan standar ISO 7730. "
+        "AC dipertahankan pada {ac.temp}°C mode {ac.mode} "
+        "untuk menjaga keseimbangan termal."
+    ),
+    # ===== Status Optimalisasi (WAJIB gunakan bahasa preventif/ringan) =====
+    "Optimalisasi": (
+        "Kondisi termal menunjukkan sensasi {pmv_desc} (PMV = {pmv}, tingkat: {severity}). "
+        "Sebagai langkah PREVENTIF, dilakukan penyesuaian RINGAN setpoint AC "
+        "dari target {target_temp}°C ke {ac.temp}°C (Δ{delta_temp}°C). "
+        "Koreksi ini bersifat BERTAHAP untuk {direction} PMV secara halus mendekati 0.{score_explanation}"
+    ),
+    # ===== Status Peringatan (koreksi aktif) =====
+    "Peringatan": (
+        "Kondisi termal menunjukkan sensasi {pmv_desc} dengan PMV = {pmv} (tingkat: {severity}). "
+        "Berdasarkan ISO 7730, {ppd}% penghuni diperkirakan tidak nyaman. "
+        "Status '{status}' memerlukan koreksi aktif. "
+        "AC disetel ke {ac.temp}°C mode {ac.mode} fan {ac.fan} "
+        "untuk mengembalikan PMV ke zona netral.{score_explanation}"
+    ),
+    # ===== Status Kritis (tindakan segera) =====
+    "Kritis": (
+        "PERHATIAN: Kondisi termal kritis dengan PMV = {pmv} (sensasi {pmv_desc}). "
+        "Sebanyak {ppd}% penghuni diperkirakan tidak nyaman, melampaui ambang toleransi. "
+        "Tindakan segera diperlukan. AC disetel ke {ac.temp}°C "
+        "mode {ac.mode} fan {ac.fan} untuk koreksi maksimum."
+    ),
+    # ===== PMV Positif (Hangat/Panas) - generic =====
+    "pmv_positive": (
+        "Kondisi termal menunjukkan sensasi {pmv_desc} dengan PMV = {pmv}. "
+        "Berdasarkan perhitungan ISO 7730, {ppd}% penghuni diperkirakan tidak nyaman. "
+        "AC disetel secara {warm_style} ke {ac.temp}°C "
+        "mode {ac.mode} fan {ac.fan}.{score_explanation}"
+    ),
+    # ===== PMV Negatif (Dingin) - generic =====
+    "pmv_negative": (
+        "Kondisi termal menunjukkan sensasi {pmv_desc} dengan PMV = {pmv}. "
+        "Berdasarkan ISO 7730, {ppd}% penghuni diperkirakan tidak nyaman. "
+        "AC disetel ke {ac.temp}°C mode {ac.mode} fan {ac.fan} "
+        "untuk mengurangi pendinginan secara {cool_style}.{score_explanation}"
+    ),
+    # ===== Default =====
+    "default": (
+        "Kondisi termal netral (PMV = {pmv}) dengan {ppd}% penghuni tidak nyaman. "
+        "Skor kualitas lingkungan {env_score}/100. "
+        "AC disetel ke {ac.temp}°C mode {ac.mode} "
+        "untuk mempertahankan kenyamanan termal."
+    ),
+}
+
+_FALLBACK_SCORE_EXPLANATION = (
+    " Meskipun kualitas lingkungan non-termal sangat baik (skor {score}%), "
+    "status ditentukan oleh kenyamanan fisiologis tubuh (PPD), bukan oleh skor lingkungan."
+)
+
+
+# ============================================================================
+# REASON CACHE - Narasi untuk kondisi yang (hampir) sama dipakai ulang
+# ============================================================================
+# Kunci cache adalah hasil rule engine yang dikuantisasi ke bucket, sehingga
+# pembacaan sensor yang berubah sangat sedikit tidak memicu panggilan LLM baru.
+REASON_CACHE_SIZE = 512     # Jumlah entry exact-match di memori
+REASON_NEAR_MISS_SIZE = 32  # Jumlah entry terakhir yang dicek untuk near-miss
+
+# Posisi field numerik (bucket) di dalam key tuple
+_NUMERIC_KEY_FIELDS = (1, 2, 5)
+
+
+# Versi prompt: narasi yang dibuat dengan prompt lama tidak dipakai lagi setelah
+# SYSTEM_PROMPT atau template data diubah (key cache memuat hash ini)
+PROMPT_VERSION = hashlib.sha256((SYSTEM_PROMPT + _DATA_SECTION_TEMPLATE).encode()).hexdigest()[:12]
+
+
+def _reason_cache_key(result: RuleResult, namespace: tuple) -> tuple:
+    """Bangun key cache dari hasil rule engine (nilai float di-bucket).
+    
+    namespace (mode, model, versi prompt) di posisi terakhir: dibandingkan exact
+    oleh _key_distance, sehingga narasi dari model/prompt lain tidak pernah dipakai.
+    """
+    ac = result.ac_control
+    return (
+        result.comfort.state,
+        round(result.comfort.pmv * 4),  # Bucket PMV 0.25
+        round(result.comfort.ppd / 5),  # Bucket PPD 5%
+        result.primary_concern,
+        result.thermal_severity,
+        round(result.env_score / 5),    # Bucket env_score 5 poin
+        (ac.temp, ac.mode, ac.fan),
+        namespace,
+    )
+
+
+def _key_distance(a: tuple, b: tuple) -> Optional[int]:
+    """Jarak antar key: None jika field kategorikal beda atau bucket selisih > 1."""
+    distance = 0
+    for i, (x, y) in enumerate(zip(a, b)):
+        if i in _NUMERIC_KEY_FIELDS:
+            if abs(x - y) > 1:
+                return None
+            distance += abs(x - y)
+        elif x != y:
+            return None
+    return distance
 
 
 class LLMService:
@@ -54,11 +422,34 @@ class LLMService:
     # History storage (class-level untuk persist antar instance)
     _execution_history: deque = deque(maxlen=10)  # Simpan maksimal 10 history terakhir
     
+    # Reason cache (class-level, sama seperti history)
+    _reason_cache: OrderedDict = OrderedDict()  # Exact-match LRU
+    _recent_reasons: deque = deque(maxlen=REASON_NEAR_MISS_SIZE)  # (key, reason) untuk near-miss
+    _cache_lock = threading.Lock()  # generate_reason bisa dipanggil dari beberapa worker thread
+    
     def __init__(self):
-        self.mode = os.getenv("LLM_MODE", "ollama").lower()
-        self.endpoint = os.getenv("LLM_ENDPOINT", "http://localhost:11434/api/generate")
-        self.api_key = os.getenv("LLM_API_KEY")
-        self.model = os.getenv("LLM_MODEL", "llama3.2")
+        config = get_config()
+        self.mode = config.llm_mode
+        self.endpoint = config.llm_endpoint
+        self.api_key = config.llm_api_key
+        self.model = config.llm_model
+        self._cache_namespace = (self.mode, self.model, PROMPT_VERSION)
+        # HTTP keep-alive: satu session + connection pool untuk semua request LLM
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=10)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Connection": "keep-alive"
+        })
+        if self.api_key:
+            self.session.headers["Authorization"] = f"Bearer {self.api_key}"
+        # Persistent cache antar restart (kosongkan LLM_CACHE_DIR untuk menonaktifkan)
+        self._disk_cache = diskcache.Cache(config.llm_cache_dir) if config.llm_cache_dir else None
+        self._disk_cache_ttl = config.llm_cache_ttl or None  # 0 = tanpa kedaluwarsa
+        # Status yang tidak perlu LLM (LLM_SKIP_STATES kosong = selalu pakai LLM)
+        self.skip_states = frozenset(config.llm_skip_states)
     
     def _save_to_history(self, sensor_data: SensorData, rule_result: RuleResult) -> None:
         """Simpan hasil eksekusi ke history."""
@@ -118,16 +509,70 @@ class LLMService:
         """Dapatkan semua history."""
         return list(self._execution_history)
 
+    def _is_deterministic(self, rule_result: RuleResult) -> bool:
+        """Status yang narasinya cukup dari template (tanpa masalah lingkungan)."""
+        return rule_result.comfort.state in self.skip_states and not rule_result.env_issues
+
+    def _cached_reason(self, key: tuple) -> Optional[str]:
+        """Cari reason di cache: exact (memori → disk), lalu near-miss (±1 bucket)."""
+        with self._cache_lock:
+            if key in self._reason_cache:
+                self._reason_cache.move_to_end(key)
+                return self._reason_cache[key]
+            recent_reasons = list(self._recent_reasons)
+        
+        if self._disk_cache is not None:
+            reason = self._disk_cache.get(key)
+            if reason is not None:
+                self._remember_reason(key, reason)
+                return reason
+        
+        # Near-miss: ambil entry terdekat yang semua bucket-nya selisih maksimal 1
+        best_reason, best_distance = None, None
+        for cached_key, cached_reason in recent_reasons:
+            distance = _key_distance(key, cached_key)
+            if distance is not None and (best_distance is None or distance < best_distance):
+                best_reason, best_distance = cached_reason, distance
+        return best_reason
+    
+    def _remember_reason(self, key: tuple, reason: str) -> None:
+        """Simpan reason ke cache memori (LRU) dan daftar near-miss."""
+        with self._cache_lock:
+            self._reason_cache[key] = reason
+            self._reason_cache.move_to_end(key)
+            if len(self._reason_cache) > REASON_CACHE_SIZE:
+                self._reason_cache.popitem(last=False)
+            self._recent_reasons.append((key, reason))
+    
+    def _store_reason(self, key: tuple, reason: str) -> None:
+        """Simpan reason hasil LLM ke semua level cache."""
+        self._remember_reason(key, reason)
+        if self._disk_cache is not None:
+            self._disk_cache.set(key, reason, expire=self._disk_cache_ttl)
+
     def generate_reason(self, sensor_data: SensorData, rule_result: RuleResult) -> str:
         """Generate narasi/reason berdasarkan data sensor dan hasil rule engine."""
-        prompt = self._build_prompt(sensor_data, rule_result)
-        
-        try:
-            response_text = self._generate(prompt)
-            reason = self._parse_reason(response_text)
-        except Exception as e:
-            # Fallback reason jika LLM gagal
+        if self._is_deterministic(rule_result):
+            # Jalur cepat: narasi template sudah cukup, LLM tidak dipanggil
             reason = self._generate_fallback_reason(sensor_data, rule_result)
+        else:
+            key = _reason_cache_key(rule_result, self._cache_namespace)
+            reason = self._cached_reason(key)
+        
+        if reason is None:
+            prompt = self._build_prompt(sensor_data, rule_result)
+            
+            try:
+                response_text = self._generate(prompt)
+                reason = self._parse_reason(response_text)
+                if not reason:
+                    raise ValueError("LLM returned an empty reason")
+                # Hanya narasi dari LLM yang di-cache (bukan fallback)
+                self._store_reason(key, reason)
+            except Exception as e:
+                # Fallback reason jika LLM gagal
+                logger.warning("[LLM] Generate failed, using fallback reason: %s", e)
+                reason = self._generate_fallback_reason(sensor_data, rule_result)
         
         # Simpan ke history setelah eksekusi berhasil
         self._save_to_history(sensor_data, rule_result)
@@ -135,223 +580,139 @@ class LLMService:
         return reason
 
     def _build_prompt(self, data: SensorData, result: RuleResult) -> str:
-        """Buat prompt untuk LLM dengan informasi ISO 7730 dan context-aware guidance."""
-        
-        pmv_desc = get_pmv_description(result.comfort.pmv)
-        
-        # Format environmental issues jika ada
-        env_issues_text = ""
-        if result.env_issues:
-            issues_list = []
-            for issue in result.env_issues:
-                issues_list.append(f"  - [{issue.severity.upper()}] {issue.description}")
-                issues_list.append(f"    → Saran: {issue.recommendation}")
-            env_issues_text = "\n".join(issues_list)
-        else:
-            env_issues_text = "  Tidak ada masalah lingkungan signifikan."
-        
-        # Tentukan fokus narasi berdasarkan primary concern
-        focus_guidance = ""
-        if result.primary_concern == "environmental":
-            focus_guidance = """FOKUS NARASI: Masalah UTAMA adalah LINGKUNGAN (bukan termal).
-- Soroti masalah non-termal (noise/lighting/humidity) sebagai penyebab utama ketidaknyamanan
-- AC tetap disebutkan tapi bukan fokus utama
-- Berikan saran untuk faktor non-termal"""
-        elif result.primary_concern == "both":
-            focus_guidance = """FOKUS NARASI: Ada masalah GANDA (termal DAN lingkungan).
-- Jelaskan kedua aspek secara seimbang
-- Prioritaskan yang lebih parah
-- Berikan rekomendasi komprehensif"""
-        elif result.primary_concern == "thermal":
-            focus_guidance = """FOKUS NARASI: Masalah UTAMA adalah TERMAL.
-- Fokus pada PMV dan koreksi AC
-- Lingkungan non-termal dalam kondisi baik"""
-        else:
-            focus_guidance = """FOKUS NARASI: Kondisi OPTIMAL.
-- Jelaskan mengapa kondisi sudah ideal
-- Sarankan untuk mempertahankan pengaturan"""
-        
-        # ===== NARRATIVE GUARDRAILS berdasarkan status =====
-        narrative_guardrails = ""
-        if result.comfort.state == "Optimalisasi":
-            narrative_guardrails = """GUARDRAIL NARASI (WAJIB untuk status Optimalisasi):
-══════════════════════════════════════════════════════════════════
-⚠️ KATA YANG DILARANG (jangan gunakan!):
-  ✘ "koreksi signifikan"
-  ✘ "penyesuaian agresif" 
-  ✘ "drastis"
-  ✘ "perubahan besar"
-
-✅ KATA YANG WAJIB digunakan:
-  ✔ "preventif"
-  ✔ "ringan"
-  ✔ "bertahap"
-  ✔ "halus"
-  ✔ "penyesuaian kecil"
-══════════════════════════════════════════════════════════════════"""
-        elif result.comfort.state == "Ideal":
-            narrative_guardrails = """GUARDRAIL NARASI (untuk status Ideal):
-══════════════════════════════════════════════════════════════════
-Tekankan bahwa kondisi sudah OPTIMAL dan tidak perlu tindakan.
-Gunakan kata: "pertahankan", "optimal", "nyaman", "seimbang"
-══════════════════════════════════════════════════════════════════"""
-        
-        # ===== MANDATORY: Penjelasan Score vs Status jika berbeda persepsi =====
-        score_status_explanation = ""
-        if result.env_score >= 80 and result.comfort.state in ("Optimalisasi", "Peringatan"):
-            score_status_explanation = f"""KALIMAT WAJIB DALAM NARASI:
-══════════════════════════════════════════════════════════════════
-Karena env_score ({result.env_score}%) tinggi tapi status "{result.comfort.state}",
-TAMBAHKAN kalimat edukatif seperti:
-"Meskipun kualitas lingkungan non-termal sangat baik (skor {result.env_score}%), 
-status ditentukan oleh kenyamanan fisiologis tubuh (PPD), bukan oleh skor lingkungan."
-══════════════════════════════════════════════════════════════════"""
-        
-        # Thermal severity description
-        thermal_severity = getattr(result, 'thermal_severity', 'none')
-        severity_desc = {
-            "none": "dalam zona netral",
-            "mild": "sedikit di luar zona nyaman (mild)",
-            "moderate": "tidak nyaman (moderate)", 
-            "severe": "sangat tidak nyaman (severe)"
-        }.get(thermal_severity, "unknown")
+        """Buat bagian DINAMIS prompt (data sensor + hasil analisis).
         
-        return f"""Kamu adalah asisten analisis kenyamanan ruangan berbasis standar ISO 7730.
+        Bagian statis (konsep ISO 7730, guardrail, format output) ada di SYSTEM_PROMPT.
+        """
+        return f"""{self._build_data_section(data, result)}
+{self._get_history_context()}"""
 
-══════════════════════════════════════════════════════════════════
-DATA SENSOR AKTUAL:
-══════════════════════════════════════════════════════════════════
-• Suhu udara (Ta): {data.temp}°C
-• Kelembapan (RH): {data.hum}%
-• Kebisingan: {data.noise} dB
-• Pencahayaan: {data.light_level} lux
-• Jumlah penghuni: {data.occupancy} orang
+    def _build_data_section(self, data: SensorData, result: RuleResult) -> str:
+        """Bagian data untuk satu kondisi ruangan (tanpa history)."""
+        pieces = [_PROMPT_PARTS[0]]
+        for getter, part in zip(_PROMPT_FIELDS, _PROMPT_PARTS[1:]):
+            pieces.append(str(getter(data, result)))
+            pieces.append(part)
+        return "".join(pieces)
 
-══════════════════════════════════════════════════════════════════
-HASIL ANALISIS KENYAMANAN TERMAL (ISO 7730):
-══════════════════════════════════════════════════════════════════
-• PMV (Predicted Mean Vote): {result.comfort.pmv}
-  → Sensasi termal: {pmv_desc}
-  → Tingkat keparahan: {severity_desc}
-
-• PPD (Predicted Percentage Dissatisfied): {result.comfort.ppd}%
-  → Artinya: {result.comfort.ppd}% penghuni diperkirakan tidak nyaman
-  → Hubungan PMV-PPD adalah EKSPONENSIAL (bukan linear!)
-
-• Status Kenyamanan Fisiologis: {result.comfort.state}
-  → Target temp: {result.target_temp}°C
-
-══════════════════════════════════════════════════════════════════
-KUALITAS LINGKUNGAN (NON-TERMAL):
-══════════════════════════════════════════════════════════════════
-• Skor Lingkungan: {result.env_score}/100
-• Detail: Pencahayaan {result.env_score_breakdown.get('lighting', 0)}/100, 
-         Kebisingan {result.env_score_breakdown.get('noise', 0)}/100,
-         Kelembapan {result.env_score_breakdown.get('humidity', 0)}/100
-
-• Masalah Lingkungan Terdeteksi:
-{env_issues_text}
-
-══════════════════════════════════════════════════════════════════
-KEPUTUSAN KONTROL AC:
-══════════════════════════════════════════════════════════════════
-• Setpoint: {result.ac_control.temp}°C (dari target {result.target_temp}°C)
-• Mode: {result.ac_control.mode}
-• Fan: {result.ac_control.fan}
-• Koreksi: trajectory-centric (dari target, bukan dari suhu aktual)
-
-══════════════════════════════════════════════════════════════════
-{focus_guidance}
-══════════════════════════════════════════════════════════════════
-
-{narrative_guardrails}
-
-{score_status_explanation}
-{self._get_history_context()}
-
-TUGAS: Buat narasi 3-5 kalimat yang:
-1. Menjelaskan kondisi dengan alur sebab-akibat
-2. Mengikuti GUARDRAIL NARASI di atas
-3. Menyertakan kalimat WAJIB jika ada
-4. Konsisten dengan status "{result.comfort.state}"
-5. Jika ada history, pertimbangkan trend dan perubahan dari eksekusi sebelumnya
-
-FORMAT OUTPUT (JSON):
-{{"reason": "<narasi 3-5 kalimat>"}}"""
-
-    def _generate(self, prompt: str, max_tokens: int = 400, temperature: float = 0.3) -> str:
-        """Generate response dari LLM."""
+    def _generate(
+        self,
+        prompt: str,
+        max_tokens: int = REASON_MAX_TOKENS,
+        temperature: float = 0.0,
+        system: str = SYSTEM_PROMPT
+    ) -> str:
+        """Generate response dari LLM (system prompt statis + prompt dinamis).
+        
+        Generasi berhenti (stop sequence / streaming Ollama) setelah string "reason" lengkap.
+        """
         if self.mode == "openai":
-            return self._openai_generate(prompt, max_tokens, temperature)
-        return self._ollama_generate(prompt, max_tokens, temperature)
+            return self._openai_generate(system, prompt, max_tokens, temperature)
+        return self._ollama_generate(system, prompt, max_tokens, temperature)
 
-    def _ollama_generate(self, prompt: str, max_tokens: int, temperature: float) -> str:
-        """Generate menggunakan Ollama."""
-        headers = {"Content-Type": "application/json"}
+    def _ollama_generate(
+        self,
+        system: str,
+        prompt: str,
+        max_tokens: int,
+        temperature: float
+    ) -> str:
+        """Generate menggunakan Ollama (streaming, berhenti lebih awal jika reason sudah lengkap)."""
         payload = {
             "model": self.model,
+            "system": system,  # Prefix statis → KV-cache dipakai ulang oleh Ollama
             "prompt": prompt,
-            "stream": False,
+            "stream": True,
             "options": {
                 "temperature": temperature,
-                "num_predict": max_tokens
+                "num_predict": max_tokens,
+                "stop": _REASON_STOP
             }
         }
         
-        resp = requests.post(self.endpoint, headers=headers, json=payload, timeout=60)
-        resp.raise_for_status()
-        data = resp.json()
-        
-        if isinstance(data, dict) and "response" in data:
-            return data["response"]
-        return json.dumps(data)
+        pieces = []
+        tail_chunks = None  # Jumlah chunk yang dibuang setelah reason lengkap
+        with self.session.post(self.endpoint, data=orjson.dumps(payload), timeout=60, stream=True) as resp:
+            resp.raise_for_status()
+            # Loop berakhir sendiri setelah chunk "done" (body habis terbaca → koneksi
+            # kembali ke pool); break hanya jika sisa stream melewati _STREAM_TAIL_CHUNKS
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                if tail_chunks is not None:
+                    tail_chunks += 1
+                    if tail_chunks > _STREAM_TAIL_CHUNKS:
+                        break
+                    continue
+                chunk = orjson.loads(line)
+                pieces.append(chunk.get("response", ""))
+                # Reason sudah lengkap (ada kutip penutup) → sisa token tidak dipakai
+                if '"' in chunk.get("response", "") and _REASON_RE.search("".join(pieces)):
+                    tail_chunks = 0
+        
+        return "".join(pieces)
 
-    def _openai_generate(self, prompt: str, max_tokens: int, temperature: float) -> str:
+    def _openai_generate(
+        self,
+        system: str,
+        prompt: str,
+        max_tokens: int,
+        temperature: float
+    ) -> str:
         """Generate menggunakan OpenAI API."""
-        headers = {"Content-Type": "application/json"}
-        if self.api_key:
-            headers["Authorization"] = f"Bearer {self.api_key}"
-        
         payload = {
             "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
+            # System message di depan → prefix identik antar request (prompt caching)
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt}
+            ],
             "max_tokens": max_tokens,
-            "temperature": temperature
+            "temperature": temperature,
+            "stop": _REASON_STOP
         }
         
-        resp = requests.post(self.endpoint, headers=headers, json=payload, timeout=60)
+        resp = self.session.post(self.endpoint, data=orjson.dumps(payload), timeout=60)
         resp.raise_for_status()
-        data = resp.json()
+        data = orjson.loads(resp.content)
         
         if "choices" in data and len(data["choices"]) > 0:
             return data["choices"][0].get("message", {}).get("content", "")
-        return json.dumps(data)
+        return orjson.dumps(data).decode()
+
+    @staticmethod
+    def _extract_json(response_text: str):
+        """Ambil JSON object dari response LLM (boleh dibungkus code fence)."""
+        text = response_text.strip()
+        
+        # Cari JSON block di dalam code fence
+        match = _JSON_FENCE_RE.search(text)
+        if match:
+            return orjson.loads(match.group(1))
+        
+        # Cari JSON object
+        start_idx = text.find("{")
+        end_idx = text.rfind("}") + 1
+        if start_idx != -1 and end_idx > start_idx:
+            text = text[start_idx:end_idx]
+        
+        return orjson.loads(text)
 
     def _parse_reason(self, response_text: str) -> str:
         """Parse response LLM untuk mendapatkan reason."""
-        text = response_text.strip()
+        # Jalur cepat: ambil string "reason" langsung dalam satu pass regex
+        match = _REASON_RE.search(response_text)
+        if match:
+            try:
+                return orjson.loads(f'"{match.group(1)}"')
+            except orjson.JSONDecodeError:
+                return match.group(1).replace('\\"', '"')
         
         try:
-            # Cari JSON block
-            if "```json" in text:
-                start = text.find("```json") + 7
-                end = text.find("```", start)
-                text = text[start:end].strip()
-            elif "```" in text:
-                start = text.find("```") + 3
-                end = text.find("```", start)
-                text = text[start:end].strip()
-            
-            # Cari JSON object
-            start_idx = text.find("{")
-            end_idx = text.rfind("}") + 1
-            if start_idx != -1 and end_idx > start_idx:
-                text = text[start_idx:end_idx]
-            
-            data = json.loads(text)
+            data = self._extract_json(response_text)
             if "reason" in data:
                 return data["reason"]
-        except (json.JSONDecodeError, ValueError):
+        except (orjson.JSONDecodeError, ValueError, TypeError):
             pass
         
         # Fallback: bersihkan text
@@ -363,114 +724,41 @@ FORMAT OUTPUT (JSON):
     def _generate_fallback_reason(self, data: SensorData, result: RuleResult) -> str:
         """Generate reason fallback dengan ISO 7730, status-aware language, dan score vs status explanation."""
         pmv = result.comfort.pmv
-        ppd = result.comfort.ppd
         status = result.comfort.state
-        pmv_desc = get_pmv_description(pmv)
-        primary_concern = result.primary_concern
         thermal_severity = getattr(result, 'thermal_severity', 'none')
         
+        # Pilih template: Boros Energi → context-aware (environmental/both) → status → arah PMV
+        if status == "Boros Energi":
+            return _FALLBACK_TEMPLATES[status]
+        if result.primary_concern in ("environmental", "both") and result.env_issues:
+            template = _FALLBACK_TEMPLATES[(result.primary_concern, "*")]
+        elif status in _FALLBACK_TEMPLATES:
+            template = _FALLBACK_TEMPLATES[status]
+        elif pmv > 0:
+            template = _FALLBACK_TEMPLATES["pmv_positive"]
+        elif pmv < 0:
+            template = _FALLBACK_TEMPLATES["pmv_negative"]
+        else:
+            template = _FALLBACK_TEMPLATES["default"]
+        
         # ===== Score vs Status explanation (wajib jika score tinggi tapi status bukan Ideal) =====
         score_explanation = ""
         if result.env_score >= 80 and status in ("Optimalisasi", "Peringatan"):
-            score_explanation = (
-                f" Meskipun kualitas lingkungan non-termal sangat baik (skor {result.env_score}%), "
-                f"status ditentukan oleh kenyamanan fisiologis tubuh (PPD), bukan oleh skor lingkungan."
-            )
-        
-        # ===== Status Boros Energi (ruangan kosong) =====
-        if status == "Boros Energi":
-            return (
-                f"Ruangan kosong (occupancy: 0) sehingga tidak ada kebutuhan kenyamanan termal. "
-                f"AC dimatikan (mode: off) untuk efisiensi energi. "
-                f"Sistem akan aktif kembali saat terdeteksi penghuni."
-            )
-        
-        # ===== Context-Aware: Masalah ENVIRONMENTAL sebagai fokus utama =====
-        if primary_concern == "environmental" and result.env_issues:
-            main_issue = result.env_issues[0]
-            return (
-                f"Kondisi termal dalam zona {pmv_desc} (PMV = {pmv}, PPD = {ppd}%). "
-                f"Namun, masalah utama adalah {main_issue.factor}: {main_issue.description}. "
-                f"Saran: {main_issue.recommendation}. "
-                f"AC tetap pada {result.ac_control.temp}°C mode {result.ac_control.mode} "
-                f"untuk mempertahankan kenyamanan termal."
-            )
-        
-        # ===== Context-Aware: Masalah GANDA (termal + environmental) =====
-        if primary_concern == "both" and result.env_issues:
-            main_issue = result.env_issues[0]
-            thermal_action = "diturunkan" if pmv > 0 else "dinaikkan"
-            return (
-                f"Terdeteksi masalah ganda: (1) Sensasi {pmv_desc} (PMV = {pmv}) dengan {ppd}% penghuni tidak nyaman, "
-                f"dan (2) {main_issue.description}. "
-                f"Untuk aspek termal, AC disetel ke {result.ac_control.temp}°C mode {result.ac_control.mode}. "
-                f"Untuk {main_issue.factor}, disarankan: {main_issue.recommendation}."
-            )
-        
-        # ===== Status Ideal (kondisi optimal) =====
-        if status == "Ideal":
-            return (
-                f"Kondisi ruangan optimal dengan PMV = {pmv} (sensasi {pmv_desc}). "
-                f"Hanya {ppd}% penghuni diperkirakan tidak nyaman berdasarkan standar ISO 7730. "
-                f"AC dipertahankan pada {result.ac_control.temp}°C mode {result.ac_control.mode} "
-                f"untuk menjaga keseimbangan termal."
-            )
-        
-        # ===== Status Optimalisasi (WAJIB gunakan bahasa preventif/ringan) =====
-        if status == "Optimalisasi":
-            # GUARDRAIL: Gunakan kata "preventif", "ringan", "bertahap", "halus"
-            delta_temp = abs(result.ac_control.temp - result.target_temp)
-            direction = "menurunkan" if pmv > 0 else "menaikkan"
-            return (
-                f"Kondisi termal menunjukkan sensasi {pmv_desc} (PMV = {pmv}, tingkat: {thermal_severity}). "
-                f"Sebagai langkah PREVENTIF, dilakukan penyesuaian RINGAN setpoint AC "
-                f"dari target {result.target_temp}°C ke {result.ac_control.temp}°C (Δ{delta_temp}°C). "
-                f"Koreksi ini bersifat BERTAHAP untuk {direction} PMV secara halus mendekati 0.{score_explanation}"
-            )
-        
-        # ===== Status Peringatan (koreksi aktif) =====
-        if status == "Peringatan":
-            return (
-                f"Kondisi termal menunjukkan sensasi {pmv_desc} dengan PMV = {pmv} (tingkat: {thermal_severity}). "
-                f"Berdasarkan ISO 7730, {ppd}% penghuni diperkirakan tidak nyaman. "
-                f"Status '{status}' memerlukan koreksi aktif. "
-                f"AC disetel ke {result.ac_control.temp}°C mode {result.ac_control.mode} fan {result.ac_control.fan} "
-                f"untuk mengembalikan PMV ke zona netral.{score_explanation}"
-            )
-        
-        # ===== Status Kritis (tindakan segera) =====
-        if status == "Kritis":
-            return (
-                f"PERHATIAN: Kondisi termal kritis dengan PMV = {pmv} (sensasi {pmv_desc}). "
-                f"Sebanyak {ppd}% penghuni diperkirakan tidak nyaman, melampaui ambang toleransi. "
-                f"Tindakan segera diperlukan. AC disetel ke {result.ac_control.temp}°C "
-                f"mode {result.ac_control.mode} fan {result.ac_control.fan} untuk koreksi maksimum."
-            )
-        
-        # ===== PMV Positif (Hangat/Panas) - generic =====
-        if pmv > 0:
-            correction_style = "ringan dan bertahap" if thermal_severity == "mild" else "aktif"
-            return (
-                f"Kondisi termal menunjukkan sensasi {pmv_desc} dengan PMV = {pmv}. "
-                f"Berdasarkan perhitungan ISO 7730, {ppd}% penghuni diperkirakan tidak nyaman. "
-                f"AC disetel secara {correction_style} ke {result.ac_control.temp}°C "
-                f"mode {result.ac_control.mode} fan {result.ac_control.fan}.{score_explanation}"
-            )
-        
-        # ===== PMV Negatif (Dingin) - generic =====
-        if pmv < 0:
-            correction_style = "ringan" if thermal_severity == "mild" else "signifikan"
-            return (
-                f"Kondisi termal menunjukkan sensasi {pmv_desc} dengan PMV = {pmv}. "
-                f"Berdasarkan ISO 7730, {ppd}% penghuni diperkirakan tidak nyaman. "
-                f"AC disetel ke {result.ac_control.temp}°C mode {result.ac_control.mode} fan {result.ac_control.fan} "
-                f"untuk mengurangi pendinginan secara {correction_style}.{score_explanation}"
-            )
-        
-        # ===== Default =====
-        return (
-            f"Kondisi termal netral (PMV = {pmv}) dengan {ppd}% penghuni tidak nyaman. "
-            f"Skor kualitas lingkungan {result.env_score}/100. "
-            f"AC disetel ke {result.ac_control.temp}°C mode {result.ac_control.mode} "
-            f"untuk mempertahankan kenyamanan termal."
+            score_explanation = _FALLBACK_SCORE_EXPLANATION.format(score=result.env_score)
+        
+        return template.format(
+            pmv=pmv,
+            ppd=result.comfort.ppd,
+            status=status,
+            pmv_desc=get_pmv_description(pmv),
+            severity=thermal_severity,
+            ac=result.ac_control,
+            target_temp=result.target_temp,
+            delta_temp=abs(result.ac_control.temp - result.target_temp),
+            direction="menurunkan" if pmv > 0 else "menaikkan",
+            warm_style="ringan dan bertahap" if thermal_severity == "mild" else "aktif",
+            cool_style="ringan" if thermal_severity == "mild" else "signifikan",
+            issue=result.env_issues[0] if result.env_issues else None,
+            env_score=result.env_score,
+            score_explanation=score_explanation
         )
@@ -1,37 +1,39 @@
 """MQTT-based Room Comfort Analysis dengan Rule Engine + LLM."""
-import json
 import time
-import os
+import queue
+import logging
+import threading
+import orjson
 import paho.mqtt.client as mqtt
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
 
-from models import SensorData, ComfortAnalysisResponse, Recommendation, InputSensor
-from rule_engine import evaluate
+from models import SensorData, SensorDataAdapter, ComfortAnalysisResponse, Recommendation, InputSensor
+from rule_engine import evaluate, RuleResult
 from llm_service import LLMService
+from config import get_config
 
-# Load environment variables
-load_dotenv()
+# Konfigurasi (.env dibaca sekali oleh get_config)
+CFG = get_config()
 
-# MQTT Configuration from .env
-MQTT_BROKER = os.getenv("MQTT_BROKER", "localhost")
-MQTT_PORT = int(os.getenv("MQTT_PORT", 1883))
-MQTT_USERNAME = os.getenv("MQTT_USERNAME", None)
-MQTT_PASSWORD = os.getenv("MQTT_PASSWORD", None)
-
-# Multiple input topics from .env (comma-separated, supports wildcards like topic/#)
-MQTT_TOPICS_INPUT = [topic.strip() for topic in os.getenv("MQTT_TOPIC_INPUT", "").split(",") if topic.strip()]
-# Extract base topic names (remove /# wildcard) for data storage
-MQTT_BASE_TOPICS = [topic.replace("/#", "").replace("/*", "") for topic in MQTT_TOPICS_INPUT]
-MQTT_TOPIC_OUTPUT = os.getenv("MQTT_TOPIC_OUTPUT", "response_LLM")
-FETCH_INTERVAL = int(os.getenv("FETCH_INTERVAL", 60))  # seconds
-DATA_COLLECTION_TIME = int(os.getenv("DATA_COLLECTION_TIME", 5))  # seconds to wait for data
+logger = logging.getLogger(__name__)
 
 # Initialize LLM service (hanya untuk narasi)
 llm_service = LLMService()
 
 # Global persistent storage untuk data sensor (retain data antar fetch)
 # Berguna untuk data event-based seperti entrance yang hanya kirim saat ada perubahan
-persistent_data = {topic: None for topic in MQTT_BASE_TOPICS}
+persistent_data = {topic: None for topic in CFG.mqtt_base_topics}
+data_lock = threading.Lock()  # on_message (thread MQTT) vs scheduler
+# Di-set saat topic menerima data baru sejak snapshot terakhir
+topic_events = {topic: threading.Event() for topic in CFG.mqtt_base_topics}
+
+# Nomor urut snapshot, mencegah hasil lama menimpa hasil baru (hanya diubah oleh scheduler)
+analysis_seq = 0
+
+# Pipeline: analisis (LLM) berjalan di worker pool, publish di thread terpisah,
+# sehingga publish snapshot N tidak menahan analisis snapshot N+1
+analysis_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="analysis")
+publish_queue = queue.Queue(maxsize=1)  # Single-slot handoff ke publisher
 
 
 def analyze_comfort(sensor_data: SensorData):
@@ -52,174 +54,239 @@ def analyze_comfort(sensor_data: SensorData):
     reason = llm_service.generate_reason(sensor_data, rule_result)
     
     # Step 3: Build response with Input_sensor
-    input_sensor = InputSensor(
+    return build_response(sensor_data, rule_result, reason), rule_result.ac_control
+
+
+def build_response(sensor_data: SensorData, rule_result: RuleResult, reason: str) -> ComfortAnalysisResponse:
+    """Gabungkan hasil rule engine dan narasi LLM menjadi response.
+    
+    Semua nilai sudah bertipe benar (SensorData tervalidasi, Comfort dari rule engine),
+    jadi response dirakit dengan model_construct tanpa validasi ulang.
+    """
+    input_sensor = InputSensor.model_construct(
         temp=sensor_data.temp,
         noise=sensor_data.noise,
         light_level=sensor_data.light_level,
         occupancy=sensor_data.occupancy
     )
     
-    response = ComfortAnalysisResponse(
+    return ComfortAnalysisResponse.model_construct(
         Comfort=rule_result.comfort,
-        Recommendation=Recommendation(
+        Recommendation=Recommendation.model_construct(
             reason=reason
         ),
         Input_sensor=input_sensor
     )
-    
-    return response, rule_result.ac_control
 
 
-def fetch_and_process():
-    """Fetch data dari MQTT sekali, proses, dan publish response."""
-    global persistent_data
+def create_mqtt_client() -> mqtt.Client:
+    """Buat MQTT client dengan kredensial dari .env."""
+    client = mqtt.Client()
     
-    # Data storage untuk sesi ini
-    collected_data = {topic: None for topic in MQTT_BASE_TOPICS}
-    data_received = False
+    if CFG.mqtt_username and CFG.mqtt_password:
+        client.username_pw_set(CFG.mqtt_username, CFG.mqtt_password)
     
-    def on_connect(client, userdata, flags, rc):
-        if rc == 0:
-            # Subscribe ke semua topics
-            for topic in MQTT_TOPICS_INPUT:
-                client.subscribe(topic)
+    return client
+
+
+def analyze_and_queue(seq: int, sensor_data: SensorData):
+    """Worker: analisis satu snapshot lalu serahkan hasilnya ke publisher."""
+    # Latest-wins: snapshot yang sudah tersusul snapshot lebih baru tidak dianalisis,
+    # sehingga antrian executor tidak menumpuk panggilan LLM basi saat LLM lebih
+    # lambat dari FETCH_INTERVAL
+    if seq < analysis_seq:
+        logger.warning("[Analysis] Skipping stale snapshot #%d (latest #%d)", seq, analysis_seq)
+        return
     
-    def on_message(client, userdata, msg):
-        nonlocal collected_data, data_received
+    try:
+        response, ac_control_obj = analyze_comfort(sensor_data)
+    except Exception as e:
+        logger.error("[Analysis] Error: %s", e)
+        return
+    publish_queue.put((seq, response, ac_control_obj))
+
+
+def publisher_loop():
+    """Publisher thread: publish hasil analisis lewat client persisten."""
+    last_seq = 0
+    while True:
+        seq, response, ac_control_obj = publish_queue.get()
+        if seq < last_seq:
+            logger.warning("[Publish] Skipping stale snapshot #%d (already published #%d)", seq, last_seq)
+            continue
+        last_seq = seq
         try:
-            payload = json.loads(msg.payload.decode())
-            base_topic = msg.topic.split('/')[0]
-            
-            print(f"[MQTT] Received from {msg.topic} (base: {base_topic}): {payload}")
-            
-            if base_topic in collected_data:
-                if collected_data[base_topic] is None:
-                    collected_data[base_topic] = {}
-                collected_data[base_topic].update(payload)
-                data_received = True
-            else:
-                print(f"[MQTT] Warning: base_topic '{base_topic}' not in {list(collected_data.keys())}")
-                
+            publish_response(client, response, ac_control_obj)
         except Exception as e:
-            print(f"[MQTT] Error: {e}")
+            logger.error("[Publish] Error: %s", e)
+
+
+def publish_response(client: mqtt.Client, response: ComfortAnalysisResponse, ac_control_obj):
+    """Publish response dan ac_control ke MQTT."""
+    # Serialisasi langsung oleh pydantic-core (tanpa dict perantara)
+    response_payload = response.model_dump_json()
     
-    # Setup MQTT Client
-    client = mqtt.Client()
+    # Serialize ac_control untuk publish terpisah
+    ac_control_payload = ac_control_obj.model_dump_json()
+    
+    # Publish response ke topic: response_LLM/device-1/data
+    publish_topic = f"{CFG.mqtt_topic_output}/device-1/data"
+    ac_control_topic = f"{CFG.mqtt_topic_output}/device-1/ac_control"
     
-    if MQTT_USERNAME and MQTT_PASSWORD:
-        client.username_pw_set(MQTT_USERNAME, MQTT_PASSWORD)
+    # Publish main response
+    result = client.publish(publish_topic, response_payload)
     
-    client.on_connect = on_connect
-    client.on_message = on_message
+    # Publish ac_control ke topic terpisah
+    result_ac = client.publish(ac_control_topic, ac_control_payload)
     
+    if result.rc == mqtt.MQTT_ERR_SUCCESS:
+        logger.info("[MQTT] Response published to '%s'", publish_topic)
+        # Pretty-print hanya jika DEBUG aktif (hindari serialisasi ulang di production)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(response.model_dump_json(indent=2))
+    else:
+        logger.error("[MQTT] Failed to publish response, error: %s", result.rc)
+    
+    if result_ac.rc == mqtt.MQTT_ERR_SUCCESS:
+        logger.info("[MQTT] AC Control published to '%s'", ac_control_topic)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(ac_control_obj.model_dump_json(indent=2))
+    else:
+        logger.error("[MQTT] Failed to publish ac_control, error: %s", result_ac.rc)
+
+
+def on_connect(client, userdata, flags, rc):
+    """Subscribe ulang ke semua topic setiap kali (re)connect."""
+    if rc == 0:
+        logger.info("[MQTT] Connected to %s:%s", CFG.mqtt_broker, CFG.mqtt_port)
+        for topic in CFG.mqtt_topics_input:
+            client.subscribe(topic)
+    else:
+        logger.error("[MQTT] Connection failed, rc: %s", rc)
+
+
+def on_message(client, userdata, msg):
+    """Update persistent_data setiap kali data sensor masuk."""
     try:
-        # Connect dan collect data
-        print(f"[Fetch] Connecting to {MQTT_BROKER}:{MQTT_PORT}...")
-        client.connect(MQTT_BROKER, MQTT_PORT, 60)
-        
-        # Start network loop in background
-        client.loop_start()
-        
-        # Wait untuk collect data
-        print(f"[Fetch] Collecting data for {DATA_COLLECTION_TIME} seconds...")
-        time.sleep(DATA_COLLECTION_TIME)
-        
-        # Stop dan disconnect
-        client.loop_stop()
-        client.disconnect()
+        payload = orjson.loads(msg.payload)
+        base_topic = msg.topic.split('/')[0]
         
-        # Update persistent_data dengan data baru yang diterima
-        for topic, data in collected_data.items():
-            if data is not None:
-                if persistent_data[topic] is None:
-                    persistent_data[topic] = {}
-                persistent_data[topic].update(data)
-                print(f"[Fetch] New data from {topic}: {data}")
+        logger.debug("[MQTT] Received from %s (base: %s): %s", msg.topic, base_topic, payload)
         
+        with data_lock:
+            if base_topic in persistent_data:
+                if persistent_data[base_topic] is None:
+                    persistent_data[base_topic] = {}
+                persistent_data[base_topic].update(payload)
+                topic_events[base_topic].set()
+            else:
+                logger.warning("[MQTT] base_topic '%s' not in %s", base_topic, list(persistent_data.keys()))
+                
+    except Exception as e:
+        logger.error("[MQTT] Error: %s", e)
+
+
+# MQTT client persisten: connect + subscribe sekali, callback jalan terus di background
+client = create_mqtt_client()
+client.on_connect = on_connect
+client.on_message = on_message
+
+
+def wait_for_fresh_data(timeout: float) -> bool:
+    """
+    Tunggu sampai SEMUA topic mengirim data baru, maksimal timeout detik.
+    
+    Returns:
+        bool: True jika semua topic fresh, False jika timeout
+    """
+    deadline = time.monotonic() + timeout
+    for event in topic_events.values():
+        if not event.wait(timeout=max(0.0, deadline - time.monotonic())):
+            return False
+    return True
+
+
+def process_and_publish():
+    """Ambil snapshot data sensor terbaru, proses, dan publish response."""
+    global analysis_seq
+    
+    try:
         # Gabungkan semua data dari persistent storage
         combined_data = {}
-        for topic, data in persistent_data.items():
-            if data is not None:
-                combined_data.update(data)
-                print(f"[Fetch] Using {topic}: {data}")
+        with data_lock:
+            for topic, data in persistent_data.items():
+                if data is not None:
+                    combined_data.update(data)
+                    logger.debug("[Process] Using %s: %s", topic, data)
+            # Data setelah snapshot ini dianggap "fresh" untuk siklus berikutnya
+            for event in topic_events.values():
+                event.clear()
         
         if not combined_data:
-            print("[Fetch] No sensor data available yet")
+            logger.info("[Process] No sensor data available yet")
             return
         
-        # Convert to SensorData
-        sensor_data = SensorData(
-            hum=combined_data.get("hum", combined_data.get("humidity")),
-            temp=combined_data.get("temp", combined_data.get("temperature")),
-            noise=combined_data.get("noise", combined_data.get("noise_level", 40)),
-            light_level=combined_data.get("light_level", combined_data.get("lux", 300)),
-            occupancy=combined_data.get("occupancy", 1)
-        )
-        
-        print(f"[Process] Combined sensor data: {sensor_data}")
+        # Convert to SensorData (adapter modul-level, skema tidak dibangun ulang)
+        sensor_data = SensorDataAdapter.validate_python({
+            "hum": combined_data.get("hum", combined_data.get("humidity")),
+            "temp": combined_data.get("temp", combined_data.get("temperature")),
+            "noise": combined_data.get("noise", combined_data.get("noise_level", 40)),
+            "light_level": combined_data.get("light_level", combined_data.get("lux", 300)),
+            "occupancy": combined_data.get("occupancy", 1),
+        })
         
-        # Analyze comfort
-        response, ac_control_obj = analyze_comfort(sensor_data)
-        response_json = response.model_dump()
-        
-        # Convert ac_control to dict untuk publish terpisah
-        ac_control = ac_control_obj.model_dump()
-        
-        # Publish response ke topic: response_LLM/device-1/data
-        publish_topic = f"{MQTT_TOPIC_OUTPUT}/device-1/data"
-        ac_control_topic = f"{MQTT_TOPIC_OUTPUT}/device-1/ac_control"
-        
-        client.reconnect()
-        
-        # Publish main response
-        result = client.publish(publish_topic, json.dumps(response_json, indent=2))
+        logger.info("[Process] Combined sensor data: %s", sensor_data)
         
-        # Publish ac_control ke topic terpisah
-        result_ac = client.publish(ac_control_topic, json.dumps(ac_control, indent=2))
+        # Analisis (LLM) di worker pool, publish oleh publisher_loop
+        analysis_seq += 1
+        analysis_executor.submit(analyze_and_queue, analysis_seq, sensor_data)
         
-        client.disconnect()
-        
-        if result.rc == mqtt.MQTT_ERR_SUCCESS:
-            print(f"[MQTT] Response published to '{publish_topic}':")
-            print(json.dumps(response_json, indent=2))
-        else:
-            print(f"[MQTT] Failed to publish response, error: {result.rc}")
-        
-        if result_ac.rc == mqtt.MQTT_ERR_SUCCESS:
-            print(f"[MQTT] AC Control published to '{ac_control_topic}':")
-            print(json.dumps(ac_control, indent=2))
-        else:
-            print(f"[MQTT] Failed to publish ac_control, error: {result_ac.rc}")
-            
     except Exception as e:
-        print(f"[Fetch] Error: {e}")
-        try:
-            client.disconnect()
-        except:
-            pass
+        logger.error("[Process] Error: %s", e)
 
 
 def main():
-    """Main function - fetch data setiap interval."""
-    print("=" * 60)
-    print("Room Comfort Analysis - MQTT Service (Periodic Fetch)")
-    print("=" * 60)
-    print(f"Broker: {MQTT_BROKER}:{MQTT_PORT}")
-    print(f"Input Topics: {', '.join(MQTT_TOPICS_INPUT)}")
-    print(f"Output Topic: {MQTT_TOPIC_OUTPUT}")
-    print(f"Fetch Interval: {FETCH_INTERVAL} seconds")
-    print(f"Data Collection Time: {DATA_COLLECTION_TIME} seconds")
-    print("=" * 60)
+    """Main function - proses data terbaru setiap interval."""
+    logging.basicConfig(
+        level=CFG.log_level,
+        format="%(asctime)s %(levelname)s %(message)s"
+    )
+    
+    logger.info("=" * 60)
+    logger.info("Room Comfort Analysis - MQTT Service (Persistent Connection)")
+    logger.info("=" * 60)
+    logger.info("Broker: %s:%s", CFG.mqtt_broker, CFG.mqtt_port)
+    logger.info("Input Topics: %s", ", ".join(CFG.mqtt_topics_input))
+    logger.info("Output Topic: %s", CFG.mqtt_topic_output)
+    logger.info("Fetch Interval: %s seconds", CFG.fetch_interval)
+    logger.info("Data Collection Time: %s seconds", CFG.data_collection_time)
+    logger.info("=" * 60)
     
     try:
+        # Connect sekali, network loop berjalan di background thread
+        logger.info("[Main] Connecting to %s:%s...", CFG.mqtt_broker, CFG.mqtt_port)
+        client.connect(CFG.mqtt_broker, CFG.mqtt_port, 60)
+        client.loop_start()
+        threading.Thread(target=publisher_loop, name="publisher", daemon=True).start()
+        
         while True:
-            print(f"\n[Scheduler] Fetching data...")
-            fetch_and_process()
-            print(f"[Scheduler] Next fetch in {FETCH_INTERVAL} seconds...")
-            time.sleep(FETCH_INTERVAL)
+            # Proses segera setelah semua topic mengirim data baru,
+            # atau setelah DATA_COLLECTION_TIME habis (pakai data terakhir)
+            logger.info("[Scheduler] Waiting for fresh data (max %s seconds)...", CFG.data_collection_time)
+            if wait_for_fresh_data(CFG.data_collection_time):
+                logger.info("[Scheduler] All topics fresh, processing...")
+            else:
+                logger.info("[Scheduler] Timeout, processing latest data...")
+            process_and_publish()
+            logger.info("[Scheduler] Next run in %s seconds...", CFG.fetch_interval)
+            time.sleep(CFG.fetch_interval)
             
     except KeyboardInterrupt:
-        print("\n[Main] Shutting down...")
+        logger.info("[Main] Shutting down...")
+    finally:
+        analysis_executor.shutdown(wait=False, cancel_futures=True)
+        client.loop_stop()
+        client.disconnect()
 
 
 if __name__ == "__main__":
@@ -1,19 +1,43 @@
 """Pydantic models for request and response schemas."""
 from typing import Literal
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, field_validator
 
 
 class SensorData(BaseModel):
     """Input payload dari sensor lingkungan ruangan."""
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     hum: float = Field(..., description="Humidity (%)")
     temp: float = Field(..., description="Temperature (°C)")
     noise: float = Field(..., description="Noise level (dB)")
     light_level: float = Field(..., description="Light level (lux)")
     occupancy: int = Field(..., description="Number of occupants")
+    
+    # Kuantisasi ke resolusi sensor: selisih di bawah presisi sensor (24.173 vs 24.172°C)
+    # tidak bermakna secara fisik, tapi akan menghasilkan prompt LLM berbeda dan
+    # menggagalkan cache. Rule engine juga menerima nilai yang sudah dibulatkan.
+    @field_validator('temp')
+    @classmethod
+    def round_temp(cls, v: float) -> float:
+        """Bulatkan suhu ke 0.1°C."""
+        return round(v, 1)
+    
+    @field_validator('hum', 'noise', 'light_level')
+    @classmethod
+    def round_whole(cls, v: float) -> float:
+        """Bulatkan humidity, noise, dan lux ke bilangan bulat."""
+        return float(round(v))
+
+
+# Adapter dibuat SEKALI saat import (skema tervalidasi di-cache); jangan buat per request.
+# Dipakai di batas ingestion MQTT untuk memvalidasi snapshot gabungan.
+SensorDataAdapter = TypeAdapter(SensorData)
 
 
 class InputSensor(BaseModel):
     """Data sensor yang digunakan untuk menghasilkan output."""
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     temp: float = Field(..., description="Temperature (°C)")
     noise: float = Field(..., description="Noise level (dB)")
     light_level: float = Field(..., description="Light level (lux)")
@@ -22,6 +46,8 @@ class InputSensor(BaseModel):
 
 class Comfort(BaseModel):
     """Hasil analisis tingkat kenyamanan."""
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     pmv: float = Field(..., description="Predicted Mean Vote (-3 to +3)")
     ppd: float = Field(..., description="Predicted Percentage Dissatisfied (%)")
     score: float = Field(..., description="Comfort score (0-100)")
@@ -35,28 +61,24 @@ ACFanSpeed = Literal["low", "medium", "high", "auto", "quiet"]
 
 class ACControl(BaseModel):
     """Pengaturan AC untuk mencapai kenyamanan."""
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     temp: int = Field(..., ge=10, le=32, description="AC temperature setting (°C) - integer value 10-32")
     mode: ACMode = Field(..., description="AC mode: 'cool', 'fan', 'dry', 'heat'")
     fan: ACFanSpeed = Field(..., description="Fan speed: 'low', 'medium', 'high', 'auto', 'quiet'")
-    
-    @field_validator('temp')
-    @classmethod
-    def validate_temp(cls, v: int) -> int:
-        """Pastikan temperature dalam range yang valid."""
-        if v < 10:
-            return 10
-        if v > 32:
-            return 32
-        return v
 
 
 class Recommendation(BaseModel):
     """Rekomendasi aksi berdasarkan analisis."""
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     reason: str = Field(..., description="Reason for the recommendation")
 
 
 class ComfortAnalysisResponse(BaseModel):
     """Response JSON terstruktur."""
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     Comfort: Comfort
     Recommendation: Recommendation
     Input_sensor: InputSensor
@@ -64,6 +86,8 @@ class ComfortAnalysisResponse(BaseModel):
 
 class HistoryEntry(BaseModel):
     """Entry untuk menyimpan history eksekusi LLM sebelumnya."""
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     timestamp: str = Field(..., description="Timestamp eksekusi (ISO format)")
     sensor_data: SensorData = Field(..., description="Data sensor saat eksekusi")
     ac_control: ACControl = Field(..., description="Pengaturan AC yang direkomendasikan")
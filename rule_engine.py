@@ -37,9 +37,17 @@ PERANAN GANDA KELEMBAPAN (Humidity Dual-Role):
 Kedua peran ini BERBEDA secara konseptual, bukan double counting.
 """
 import math
+import bisect
+import logging
+import numpy as np
+from collections import namedtuple
 from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
 from models import SensorData, Comfort, ACControl
 
+logger = logging.getLogger(__name__)
+
 
 # ============================================================================
 # DEFAULT ASSUMPTIONS (jika tidak ada sensor)
@@ -53,15 +61,26 @@ DEFAULT_CLOTHING_INSULATION = 0.5  # Clo (typical indoor clothing)
 # REFERENCE TABLE - Digunakan sebagai BOUNDARY & TARGET, bukan nilai absolut
 # ============================================================================
 # Format: (occ_min, occ_max, target_temp, hum_min, hum_max, lux, noise_max)
+ReferenceRow = namedtuple(
+    "ReferenceRow", ["occ_min", "occ_max", "target_temp", "hum_min", "hum_max", "lux", "noise_max"]
+)
+
 REFERENCE_TABLE = [
-    (0, 0, 24.0, 50, 50, 450, 45),      # Ruangan kosong
-    (1, 10, 23.5, 45, 55, 400, 45),     # Occupancy rendah
-    (11, 18, 25.0, 45, 55, 420, 45),    # Occupancy sedang
-    (19, 25, 26.5, 56, 65, 380, 55),    # Occupancy tinggi
-    (26, 30, 27.1, 66, 70, 550, 55),    # Occupancy sangat tinggi
-    (31, 999, 28.5, 71, 75, 600, 60),   # Occupancy ekstrem
+    ReferenceRow(0, 0, 24.0, 50, 50, 450, 45),      # Ruangan kosong
+    ReferenceRow(1, 10, 23.5, 45, 55, 400, 45),     # Occupancy rendah
+    ReferenceRow(11, 18, 25.0, 45, 55, 420, 45),    # Occupancy sedang
+    ReferenceRow(19, 25, 26.5, 56, 65, 380, 55),    # Occupancy tinggi
+    ReferenceRow(26, 30, 27.1, 66, 70, 550, 55),    # Occupancy sangat tinggi
+    ReferenceRow(31, 999, 28.5, 71, 75, 600, 60),   # Occupancy ekstrem
 ]
 
+# Lookup O(1) per occupancy (0..999), dibangun sekali saat import
+_REF_BY_OCC = [REFERENCE_TABLE[-1]] * (REFERENCE_TABLE[-1].occ_max + 1)
+for _ref in REFERENCE_TABLE:
+    for _occ in range(_ref.occ_min, _ref.occ_max + 1):
+        _REF_BY_OCC[_occ] = _ref
+del _ref, _occ
+
 # ============================================================================
 # STATUS MAPPING berdasarkan PPD (ISO 7730)
 # ============================================================================
@@ -85,8 +104,16 @@ PPD_STATUS_MAP = [
     (50, 100, "Kritis"),        # PPD > 50%: Tindakan segera diperlukan
 ]
 
+# Kode status integer (urutan = PPD_STATUS_MAP, lalu "Boros Energi" untuk ruangan kosong)
+STATUS_IDEAL, STATUS_OPTIMALISASI, STATUS_PERINGATAN, STATUS_KRITIS, STATUS_BOROS_ENERGI = range(5)
+STATUS_NAMES = tuple(status for _, _, status in PPD_STATUS_MAP) + ("Boros Energi",)
 
-@dataclass
+# Batas atas (inklusif) tiap status untuk bisect_left: PPD tepat 10 → "Ideal",
+# 10.1 → "Optimalisasi", dst. PPD > 50 (termasuk > 100) → "Kritis".
+_PPD_BOUNDS = tuple(ppd_max for _, ppd_max, _ in PPD_STATUS_MAP[:-1])
+
+
+@dataclass(slots=True, frozen=True)
 class EnvIssue:
     """Masalah lingkungan non-termal yang terdeteksi."""
     factor: str          # lighting, noise, humidity
@@ -95,7 +122,7 @@ class EnvIssue:
     recommendation: str  # Saran perbaikan selain AC
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class RuleResult:
     """Hasil dari rule engine.
     
@@ -114,50 +141,48 @@ class RuleResult:
     target_noise_max: int
     # Environmental quality score (TERPISAH dari PMV/PPD)
     env_score: float
-    env_score_breakdown: dict
+    env_score_breakdown: MappingProxyType  # Read-only: dipakai bersama lewat cache evaluate()
     # PMV calculation inputs (untuk transparansi dan dokumentasi constraint)
-    pmv_inputs: dict
+    pmv_inputs: MappingProxyType  # Read-only
     # Deviasi untuk narasi
     temp_deviation: float
     hum_deviation: float
     # Context-aware: masalah non-termal yang terdeteksi
-    env_issues: list  # List of EnvIssue
+    env_issues: tuple  # Tuple of EnvIssue (read-only)
     # Flag: apakah masalah utama adalah termal atau non-termal?
     primary_concern: str  # "thermal", "environmental", "both", "none"
     # Thermal severity level (untuk kontrol yang lebih nuanced)
     thermal_severity: str  # "none", "mild", "moderate", "severe"
 
 
-def get_reference_for_occupancy(occupancy: int) -> tuple:
+def get_reference_for_occupancy(occupancy: int) -> ReferenceRow:
     """Ambil target values berdasarkan occupancy."""
-    for ref in REFERENCE_TABLE:
-        occ_min, occ_max = ref[0], ref[1]
-        if occ_min <= occupancy <= occ_max:
-            return ref
+    if 0 <= occupancy < len(_REF_BY_OCC):
+        return _REF_BY_OCC[occupancy]
     return REFERENCE_TABLE[-1]  # Fallback ke occupancy tertinggi
 
 
 # ============================================================================
 # PMV CALCULATION - ISO 7730 (Fanger's Equation)
 # ============================================================================
-def calculate_pmv(
-    ta: float,          # Air temperature (°C)
-    tr: float,          # Mean radiant temperature (°C)
-    vel: float,         # Air velocity (m/s)
-    rh: float,          # Relative humidity (%)
-    met: float,         # Metabolic rate (met)
-    clo: float          # Clothing insulation (clo)
-) -> float:
-    """
-    Hitung PMV menggunakan rumus Fanger (ISO 7730).
-    
-    PMV = (0.303 * e^(-0.036*M) + 0.028) * L
+# Core numerik ditulis sebagai Python murni (*_py), lalu dipilih implementasinya di
+# bawah: modul AOT _rule_engine_native → JIT Numba → Python murni.
+# Signature dipakai bersama oleh JIT di sini dan build AOT (rule_engine_compile.py).
+PMV_CORE_SIG = "float64(float64, float64, float64, float64, float64, float64)"
+PMV_DEFAULT_CORE_SIG = "float64(float64, float64)"
+PPD_CORE_SIG = "float64(float64)"
+
+
+def _pmv_core_py(ta, tr, vel, rh, met, clo):
+    """Inti numerik rumus Fanger (float murni, tanpa pembulatan/clamp)."""
+    # Nama lokal: LOAD_FAST alih-alih LOAD_GLOBAL + LOAD_ATTR di jalur Python murni
+    _exp = math.exp
+    _sqrt = math.sqrt
+    _abs = abs
     
-    di mana L adalah thermal load (ketidakseimbangan panas tubuh)
-    """
     # Konversi unit
     M = met * 58.15  # Metabolic rate (W/m²)
-    W = 0  # External work (W/m²), biasanya 0 untuk aktivitas kantor
+    W = 0.0  # External work (W/m²), biasanya 0 untuk aktivitas kantor
     
     # Clothing insulation
     if clo <= 0.078:
@@ -168,45 +193,194 @@ def calculate_pmv(
     Icl = clo * 0.155  # Clothing insulation (m²·K/W)
     
     # Water vapor pressure (Pa)
-    pa = rh * 10 * math.exp(16.6536 - 4030.183 / (ta + 235))
+    pa = rh * 10 * _exp(16.6536 - 4030.183 / (ta + 235))
     
     # Heat transfer coefficient by convection
-    hc_natural = 2.38 * abs(35.7 - 0.028 * (M - W) - ta) ** 0.25
-    hc_forced = 12.1 * math.sqrt(vel)
+    hc_natural = 2.38 * _abs(35.7 - 0.028 * (M - W) - ta) ** 0.25
+    hc_forced = 12.1 * _sqrt(vel)
     hc = max(hc_natural, hc_forced)
     
-    # Iterative calculation for clothing surface temperature
-    tcl = 35.7 - 0.028 * (M - W)  # Initial guess
-    
-    for _ in range(100):  # Max iterations
-        tcl_old = tcl
-        
-        # Clothing surface temperature
-        tcl = 35.7 - 0.028 * (M - W) - Icl * (
-            3.96e-8 * fcl * ((tcl + 273) ** 4 - (tr + 273) ** 4) +
-            fcl * hc * (tcl - ta)
-        )
-        
-        if abs(tcl - tcl_old) < 0.001:
-            break
+    # Clothing surface temperature: solusi f(tcl) = tcl - base + Icl*(K*(tk⁴ - tr⁴) + fcl*hc*(tcl - ta)) = 0
+    # Iterasi fixed-point lama berosilasi (|dg/dtcl| ≈ 0.9); Newton konvergen
+    # dalam ≤3 langkah di rentang operasi, jadi 4 langkah di-unroll tanpa branch.
+    base = 35.7 - 0.028 * (M - W)
+    K = 3.96e-8 * fcl
+    conv = fcl * hc
+    tr4 = (tr + 273) ** 4
+    
+    tcl = base  # Initial guess
+    tk = tcl + 273
+    tcl -= (tcl - base + Icl * (K * (tk ** 4 - tr4) + conv * (tcl - ta))) / (1 + Icl * (4 * K * tk ** 3 + conv))
+    tk = tcl + 273
+    tcl -= (tcl - base + Icl * (K * (tk ** 4 - tr4) + conv * (tcl - ta))) / (1 + Icl * (4 * K * tk ** 3 + conv))
+    tk = tcl + 273
+    tcl -= (tcl - base + Icl * (K * (tk ** 4 - tr4) + conv * (tcl - ta))) / (1 + Icl * (4 * K * tk ** 3 + conv))
+    tk = tcl + 273
+    tcl -= (tcl - base + Icl * (K * (tk ** 4 - tr4) + conv * (tcl - ta))) / (1 + Icl * (4 * K * tk ** 3 + conv))
     
     # Thermal load (L)
     # Heat loss from skin
     HL1 = 3.05e-3 * (5733 - 6.99 * (M - W) - pa)  # Skin diffusion
-    HL2 = 0.42 * ((M - W) - 58.15) if (M - W) > 58.15 else 0  # Sweating
+    HL2 = 0.42 * ((M - W) - 58.15) if (M - W) > 58.15 else 0.0  # Sweating
     HL3 = 1.7e-5 * M * (5867 - pa)  # Latent respiration
     HL4 = 0.0014 * M * (34 - ta)  # Dry respiration
-    HL5 = 3.96e-8 * fcl * ((tcl + 273) ** 4 - (tr + 273) ** 4)  # Radiation
-    HL6 = fcl * hc * (tcl - ta)  # Convection
+    HL5 = K * ((tcl + 273) ** 4 - tr4)  # Radiation
+    HL6 = conv * (tcl - ta)  # Convection
     
     # Total thermal load
     L = (M - W) - HL1 - HL2 - HL3 - HL4 - HL5 - HL6
     
     # PMV
-    pmv = (0.303 * math.exp(-0.036 * M) + 0.028) * L
+    return (0.303 * _exp(-0.036 * M) + 0.028) * L
+
+
+def _ppd_core_py(pmv):
+    """Inti numerik rumus PPD (tanpa pembulatan/clamp)."""
+    return 100 - 95 * math.exp(-0.03353 * pmv**4 - 0.2179 * pmv**2)
+
+
+# Konstanta turunan untuk asumsi DEFAULT_* (met, clo, vel, offset Tr tetap).
+# Dihitung sekali saat import; Numba mem-fold global modul sebagai konstanta kompilasi.
+_M_DEFAULT = DEFAULT_METABOLIC_RATE * 58.15
+_FCL_DEFAULT = (
+    1.0 + 1.290 * DEFAULT_CLOTHING_INSULATION if DEFAULT_CLOTHING_INSULATION <= 0.078
+    else 1.05 + 0.645 * DEFAULT_CLOTHING_INSULATION
+)
+_ICL_DEFAULT = DEFAULT_CLOTHING_INSULATION * 0.155
+_K_DEFAULT = 3.96e-8 * _FCL_DEFAULT
+_TCL_BASE_DEFAULT = 35.7 - 0.028 * _M_DEFAULT
+_HC_FORCED_DEFAULT = 12.1 * math.sqrt(DEFAULT_AIR_VELOCITY)
+_HL1_BASE_DEFAULT = 5733 - 6.99 * _M_DEFAULT
+_HL2_DEFAULT = 0.42 * (_M_DEFAULT - 58.15) if _M_DEFAULT > 58.15 else 0.0
+_HL3_COEF_DEFAULT = 1.7e-5 * _M_DEFAULT
+_HL4_COEF_DEFAULT = 0.0014 * _M_DEFAULT
+_PMV_COEF_DEFAULT = 0.303 * math.exp(-0.036 * _M_DEFAULT) + 0.028
+
+
+def _pmv_default_core_py(ta, rh):
+    """_pmv_core_py yang dispesialisasi untuk asumsi DEFAULT_* (hanya Ta dan RH dinamis)."""
+    # Konstanta modul yang dipakai berulang di langkah Newton → nama lokal
+    _exp = math.exp
+    base = _TCL_BASE_DEFAULT
+    Icl = _ICL_DEFAULT
+    K = _K_DEFAULT
+    
+    tr = ta + DEFAULT_MEAN_RADIANT_TEMP_OFFSET
+    pa = rh * 10 * _exp(16.6536 - 4030.183 / (ta + 235))
+    
+    hc = max(2.38 * abs(base - ta) ** 0.25, _HC_FORCED_DEFAULT)
+    conv = _FCL_DEFAULT * hc
+    tr4 = (tr + 273) ** 4
+    
+    tcl = base
+    tk = tcl + 273
+    tcl -= (tcl - base + Icl * (K * (tk ** 4 - tr4) + conv * (tcl - ta))) / (1 + Icl * (4 * K * tk ** 3 + conv))
+    tk = tcl + 273
+    tcl -= (tcl - base + Icl * (K * (tk ** 4 - tr4) + conv * (tcl - ta))) / (1 + Icl * (4 * K * tk ** 3 + conv))
+    tk = tcl + 273
+    tcl -= (tcl - base + Icl * (K * (tk ** 4 - tr4) + conv * (tcl - ta))) / (1 + Icl * (4 * K * tk ** 3 + conv))
+    tk = tcl + 273
+    tcl -= (tcl - base + Icl * (K * (tk ** 4 - tr4) + conv * (tcl - ta))) / (1 + Icl * (4 * K * tk ** 3 + conv))
+    
+    HL1 = 3.05e-3 * (_HL1_BASE_DEFAULT - pa)
+    HL3 = _HL3_COEF_DEFAULT * (5867 - pa)
+    HL4 = _HL4_COEF_DEFAULT * (34 - ta)
+    HL5 = K * ((tcl + 273) ** 4 - tr4)
+    HL6 = conv * (tcl - ta)
+    
+    L = _M_DEFAULT - HL1 - _HL2_DEFAULT - HL3 - HL4 - HL5 - HL6
+    return _PMV_COEF_DEFAULT * L
+
+
+# Titik uji modul AOT: (ta, rh) untuk core default, plus (vel, met, clo) non-default
+# untuk core umum, sehingga perubahan rumus maupun DEFAULT_* sama-sama terdeteksi
+_AOT_CHECK_POINTS = ((16.0, 30.0), (24.3, 55.0), (33.5, 85.0))
+_AOT_CHECK_CASES = ((0.1, 1.2, 0.5), (0.3, 1.0, 0.3), (0.2, 1.6, 1.0))
+_AOT_CHECK_TOL = 1e-9  # AOT tanpa fastmath vs Python murni: selisih hanya di ulp terakhir
+
+
+def _native_is_current(native) -> bool:
+    """True jika core di modul AOT memberi hasil yang sama dengan core *_py saat ini.
     
-    # Clamp PMV to -3 to +3
-    return max(-3.0, min(3.0, round(pmv, 2)))
+    Modul AOT adalah hasil build terpisah; jika rumus atau DEFAULT_* diubah tanpa
+    build ulang, modul lama akan menghitung rumus lama tanpa error.
+    """
+    for ta, rh in _AOT_CHECK_POINTS:
+        pmv = _pmv_default_core_py(ta, rh)
+        pairs = [
+            (native.pmv_default_core(ta, rh), pmv),
+            (native.ppd_core(pmv), _ppd_core_py(pmv)),
+        ]
+        for vel, met, clo in _AOT_CHECK_CASES:
+            pairs.append((native.pmv_core(ta, ta + 2.0, vel, rh, met, clo),
+                          _pmv_core_py(ta, ta + 2.0, vel, rh, met, clo)))
+        if any(abs(a - b) > _AOT_CHECK_TOL for a, b in pairs):
+            return False
+    return True
+
+
+# Modul AOT (python rule_engine_compile.py) menghindari kompilasi JIT saat import.
+# Modul AOT yang basi (hasil berbeda dari core *_py) diabaikan → fallback ke JIT.
+# Tanpa modul AOT: JIT dengan signature eksplisit → dikompilasi saat import dan
+# di-cache ke disk (__pycache__). Build ulang AOT jika rumus atau DEFAULT_* berubah.
+try:
+    import _rule_engine_native
+except ImportError:
+    _rule_engine_native = None
+
+if _rule_engine_native is not None and not _native_is_current(_rule_engine_native):
+    logger.warning(
+        "[RuleEngine] _rule_engine_native is stale (differs from rule_engine.py), "
+        "using JIT; rebuild with: python rule_engine_compile.py"
+    )
+    _rule_engine_native = None
+
+if _rule_engine_native is not None:
+    _pmv_core = _rule_engine_native.pmv_core
+    _pmv_default_core = _rule_engine_native.pmv_default_core
+    _ppd_core = _rule_engine_native.ppd_core
+else:
+    try:
+        from numba import njit
+    except ImportError:  # Numba opsional: tanpa Numba solver PMV berjalan sebagai Python murni
+        def njit(*args, **kwargs):
+            """Pengganti no-op untuk numba.njit."""
+            return lambda func: func
+    
+    _pmv_core = njit(PMV_CORE_SIG, cache=True, fastmath=True)(_pmv_core_py)
+    _pmv_default_core = njit(PMV_DEFAULT_CORE_SIG, cache=True, fastmath=True)(_pmv_default_core_py)
+    _ppd_core = njit(PPD_CORE_SIG, cache=True, fastmath=True)(_ppd_core_py)
+
+
+def calculate_pmv(
+    ta: float,          # Air temperature (°C)
+    tr: float,          # Mean radiant temperature (°C)
+    vel: float,         # Air velocity (m/s)
+    rh: float,          # Relative humidity (%)
+    met: float,         # Metabolic rate (met)
+    clo: float          # Clothing insulation (clo)
+) -> float:
+    """
+    Hitung PMV menggunakan rumus Fanger (ISO 7730).
+    
+    PMV = (0.303 * e^(-0.036*M) + 0.028) * L
+    
+    di mana L adalah thermal load (ketidakseimbangan panas tubuh)
+    """
+    pmv = _pmv_core(ta, tr, vel, rh, met, clo)
+    
+    # Clamp PMV to -3 to +3 (dibulatkan ke presisi output di _evaluate_core)
+    return max(-3.0, min(3.0, pmv))
+
+
+def calculate_pmv_default(ta: float, rh: float) -> float:
+    """
+    calculate_pmv untuk asumsi default (Tr = Ta + offset, vel, met, clo dari DEFAULT_*).
+    
+    Hasil identik dengan calculate_pmv(ta, ta + offset, vel, rh, met, clo).
+    """
+    pmv = _pmv_default_core(ta, rh)
+    return max(-3.0, min(3.0, pmv))
 
 
 def calculate_ppd(pmv: float) -> float:
@@ -217,24 +391,85 @@ def calculate_ppd(pmv: float) -> float:
     
     Minimum PPD ≈ 5% saat PMV = 0
     """
-    ppd = 100 - 95 * math.exp(-0.03353 * pmv**4 - 0.2179 * pmv**2)
-    return round(max(5.0, min(100.0, ppd)), 1)
+    ppd = _ppd_core(pmv)
+    return max(5.0, min(100.0, ppd))
 
 
-def get_status_from_ppd(ppd: float, occupancy: int) -> str:
+# Jumlah langkah Newton tetap untuk tcl pada versi array (tanpa break → seragam per elemen)
+PMV_ARRAY_NEWTON_STEPS = 4
+
+
+def calculate_pmv_array(ta, tr, vel, rh, met, clo) -> np.ndarray:
     """
-    Tentukan status berdasarkan PPD.
+    Versi vektor calculate_pmv untuk banyak sampel sekaligus (log, data grid).
     
-    PPD adalah indikator utama kenyamanan termal manusia.
+    Semua argumen boleh berupa ndarray atau skalar (broadcasting NumPy).
+    Iterasi tcl memakai langkah Newton yang sama dengan _pmv_core, dengan jumlah
+    tetap sehingga setiap elemen menjalankan operasi yang sama.
     """
+    ta, tr, vel, rh, met, clo = np.broadcast_arrays(
+        *(np.asarray(x, dtype=np.float64) for x in (ta, tr, vel, rh, met, clo))
+    )
+    
+    M = met * 58.15
+    MW = M  # External work W = 0
+    
+    fcl = np.where(clo <= 0.078, 1.0 + 1.290 * clo, 1.05 + 0.645 * clo)
+    Icl = clo * 0.155
+    
+    pa = rh * 10 * np.exp(16.6536 - 4030.183 / (ta + 235))
+    
+    hc_natural = 2.38 * np.abs(35.7 - 0.028 * MW - ta) ** 0.25
+    hc_forced = 12.1 * np.sqrt(vel)
+    hc = np.maximum(hc_natural, hc_forced)
+    
+    # Newton pada f(tcl) = tcl - (35.7 - 0.028*MW - Icl*(radiasi + konveksi)) = 0
+    tcl_base = 35.7 - 0.028 * MW
+    tr4 = (tr + 273) ** 4
+    rad = 3.96e-8 * fcl
+    conv = fcl * hc
+    tcl = tcl_base.copy()
+    for _ in range(PMV_ARRAY_NEWTON_STEPS):
+        tk = tcl + 273
+        f = tcl - tcl_base + Icl * (rad * (tk ** 4 - tr4) + conv * (tcl - ta))
+        df = 1 + Icl * (4 * rad * tk ** 3 + conv)
+        tcl = tcl - f / df
+    
+    HL1 = 3.05e-3 * (5733 - 6.99 * MW - pa)
+    HL2 = np.where(MW > 58.15, 0.42 * (MW - 58.15), 0.0)
+    HL3 = 1.7e-5 * M * (5867 - pa)
+    HL4 = 0.0014 * M * (34 - ta)
+    HL5 = rad * ((tcl + 273) ** 4 - tr4)
+    HL6 = conv * (tcl - ta)
+    
+    L = MW - HL1 - HL2 - HL3 - HL4 - HL5 - HL6
+    pmv = (0.303 * np.exp(-0.036 * M) + 0.028) * L
+    
+    return np.clip(pmv, -3.0, 3.0)
+
+
+def calculate_ppd_array(pmv) -> np.ndarray:
+    """Versi vektor calculate_ppd."""
+    pmv = np.asarray(pmv, dtype=np.float64)
+    ppd = 100 - 95 * np.exp(-0.03353 * pmv**4 - 0.2179 * pmv**2)
+    return np.clip(ppd, 5.0, 100.0)
+
+
+def get_status_code_from_ppd(ppd: float, occupancy: int) -> int:
+    """Sama dengan get_status_from_ppd, tetapi mengembalikan kode STATUS_* (int)."""
     if occupancy == 0:
-        return "Boros Energi"
+        return STATUS_BOROS_ENERGI
     
-    for ppd_min, ppd_max, status in PPD_STATUS_MAP:
-        if ppd_min < ppd <= ppd_max or (ppd_min == 0 and ppd <= ppd_max):
-            return status
+    return bisect.bisect_left(_PPD_BOUNDS, ppd)
+
+
+def get_status_from_ppd(ppd: float, occupancy: int) -> str:
+    """
+    Tentukan status berdasarkan PPD.
     
-    return "Kritis"
+    PPD adalah indikator utama kenyamanan termal manusia.
+    """
+    return STATUS_NAMES[get_status_code_from_ppd(ppd, occupancy)]
 
 
 # ============================================================================
@@ -246,6 +481,35 @@ def get_status_from_ppd(ppd: float, occupancy: int) -> str:
 # - Di env_score: Efek kualitas udara (pengap, kesehatan pernapasan)
 # Ini BUKAN double counting, melainkan analisis dari sudut pandang berbeda.
 # ============================================================================
+# Skor bertingkat per faktor: deviasi ≤ limits[i] → scores[i];
+# di atas limit terakhir → max(0, 100 - deviasi × slope)
+ScoreBands = namedtuple("ScoreBands", ["limits", "scores", "slope"])
+
+LUX_BANDS = ScoreBands(limits=(50, 100, 200), scores=(100, 80, 60), slope=0.2)      # |lux - target|
+NOISE_BANDS = ScoreBands(limits=(0, 5, 10), scores=(100, 80, 60), slope=5)          # dB di atas batas
+HUM_BANDS = ScoreBands(limits=(0, 5, 10, 15), scores=(100, 90, 70, 50), slope=3)    # % di luar rentang
+
+# Bobot (lighting, noise, humidity): lighting dan noise lebih penting untuk produktivitas
+ENV_SCORE_WEIGHTS = (0.35, 0.35, 0.3)
+
+
+def _band_score(deviation: float, bands: ScoreBands) -> float:
+    """Skor 0-100 dari deviasi menggunakan tabel ScoreBands."""
+    i = bisect.bisect_left(bands.limits, deviation)
+    if i < len(bands.scores):
+        return bands.scores[i]
+    return max(0, 100 - deviation * bands.slope)
+
+
+# Saran perbaikan non-AC per jenis masalah lingkungan (EnvIssue.recommendation)
+_REC_LUX_DIM = "Tambah sumber cahaya atau buka tirai"
+_REC_LUX_BRIGHT = "Kurangi pencahayaan atau gunakan tirai anti-silau"
+_REC_NOISE_HIGH = "Identifikasi dan eliminasi sumber bising, pertimbangkan peredam suara"
+_REC_NOISE_MOD = "Kurangi aktivitas bising atau gunakan white noise"
+_REC_HUM_DRY = "Gunakan humidifier atau kurangi intensitas AC"
+_REC_HUM_WET = "Tingkatkan ventilasi atau gunakan dehumidifier"
+
+
 def calculate_env_score(
     lux_actual: float,
     lux_target: float,
@@ -270,82 +534,54 @@ def calculate_env_score(
     issues = []
     
     # ===== Lighting score (0-100) =====
-    lux_deviation = abs(lux_actual - lux_target)
-    if lux_deviation <= 50:
-        lux_score = 100
-    elif lux_deviation <= 100:
-        lux_score = 80
-    elif lux_deviation <= 200:
-        lux_score = 60
-    else:
-        lux_score = max(0, 100 - lux_deviation / 5)
+    lux_delta = lux_actual - lux_target  # Negatif = redup, positif = silau
+    lux_score = _band_score(abs(lux_delta), LUX_BANDS)
     breakdown["lighting"] = round(lux_score, 1)
     
     # Detect lighting issues
-    if lux_actual < lux_target - 100:
-        severity = "severe" if lux_actual < lux_target - 200 else "moderate"
+    if lux_delta < -100:
+        severity = "severe" if lux_delta < -200 else "moderate"
         issues.append(EnvIssue(
             factor="lighting",
             severity=severity,
             description=f"Pencahayaan terlalu redup ({lux_actual} lux, target {lux_target} lux)",
-            recommendation="Tambah sumber cahaya atau buka tirai"
+            recommendation=_REC_LUX_DIM
         ))
-    elif lux_actual > lux_target + 200:
-        severity = "severe" if lux_actual > lux_target + 400 else "moderate"
+    elif lux_delta > 200:
+        severity = "severe" if lux_delta > 400 else "moderate"
         issues.append(EnvIssue(
             factor="lighting",
             severity=severity,
             description=f"Pencahayaan berlebihan/silau ({lux_actual} lux, target {lux_target} lux)",
-            recommendation="Kurangi pencahayaan atau gunakan tirai anti-silau"
+            recommendation=_REC_LUX_BRIGHT
         ))
     
     # ===== Noise score (0-100) =====
-    if noise_actual <= noise_max:
-        noise_score = 100
-    elif noise_actual <= noise_max + 5:
-        noise_score = 80
-    elif noise_actual <= noise_max + 10:
-        noise_score = 60
-    else:
-        noise_score = max(0, 100 - (noise_actual - noise_max) * 5)
+    noise_over = noise_actual - noise_max
+    noise_score = _band_score(noise_over, NOISE_BANDS)
     breakdown["noise"] = round(noise_score, 1)
     
     # Detect noise issues
-    noise_over = noise_actual - noise_max
     if noise_over > 15:
         issues.append(EnvIssue(
             factor="noise",
             severity="severe",
             description=f"Kebisingan sangat tinggi ({noise_actual} dB, batas {noise_max} dB)",
-            recommendation="Identifikasi dan eliminasi sumber bising, pertimbangkan peredam suara"
+            recommendation=_REC_NOISE_HIGH
         ))
     elif noise_over > 5:
         issues.append(EnvIssue(
             factor="noise",
             severity="moderate",
             description=f"Kebisingan di atas batas nyaman ({noise_actual} dB, batas {noise_max} dB)",
-            recommendation="Kurangi aktivitas bising atau gunakan white noise"
+            recommendation=_REC_NOISE_MOD
         ))
     
     # ===== Humidity score (0-100) =====
     # Catatan: Di sini humidity dinilai dari perspektif KUALITAS UDARA (pengap, pernapasan)
     # berbeda dengan perannya di PMV yang untuk EVAPORASI keringat
-    if hum_min <= hum_actual <= hum_max:
-        hum_score = 100
-    else:
-        if hum_actual < hum_min:
-            hum_deviation = hum_min - hum_actual
-        else:
-            hum_deviation = hum_actual - hum_max
-        
-        if hum_deviation <= 5:
-            hum_score = 90
-        elif hum_deviation <= 10:
-            hum_score = 70
-        elif hum_deviation <= 15:
-            hum_score = 50
-        else:
-            hum_score = max(0, 100 - hum_deviation * 3)
+    # Deviasi = jarak ke rentang target (0 jika di dalam rentang)
+    hum_score = _band_score(max(hum_min - hum_actual, hum_actual - hum_max, 0), HUM_BANDS)
     breakdown["humidity"] = round(hum_score, 1)
     
     # Detect humidity issues (dari perspektif kualitas udara)
@@ -354,7 +590,7 @@ def calculate_env_score(
             factor="humidity",
             severity="moderate",
             description=f"Udara terlalu kering ({hum_actual}%, target {hum_min}-{hum_max}%)",
-            recommendation="Gunakan humidifier atau kurangi intensitas AC"
+            recommendation=_REC_HUM_DRY
         ))
     elif hum_actual > hum_max + 10:
         severity = "severe" if hum_actual > hum_max + 20 else "moderate"
@@ -362,14 +598,15 @@ def calculate_env_score(
             factor="humidity",
             severity=severity,
             description=f"Udara terlalu lembap/pengap ({hum_actual}%, target {hum_min}-{hum_max}%)",
-            recommendation="Tingkatkan ventilasi atau gunakan dehumidifier"
+            recommendation=_REC_HUM_WET
         ))
     
     # Overall environmental score (weighted average)
-    # Lighting dan noise lebih penting untuk produktivitas
-    total_score = (lux_score * 0.35 + noise_score * 0.35 + hum_score * 0.3)
+    total_score = sum(
+        score * weight for score, weight in zip((lux_score, noise_score, hum_score), ENV_SCORE_WEIGHTS)
+    )
     
-    return round(total_score, 1), breakdown, issues
+    return total_score, breakdown, issues
 
 
 # ============================================================================
@@ -399,27 +636,67 @@ STATUS_MAX_CORRECTION = {
     "Kritis": 3.0,          # Koreksi maksimum
     "Boros Energi": 0.0,    # AC off
 }
+# Versi tuple, diindeks kode STATUS_*
+_STATUS_MAX = tuple(STATUS_MAX_CORRECTION[name] for name in STATUS_NAMES)
+
+# Tingkat keparahan termal sebagai int; label string hanya di RuleResult
+SEV_NONE, SEV_MILD, SEV_MODERATE, SEV_SEVERE = range(4)
+SEVERITY_NAMES = ("none", "mild", "moderate", "severe")
+
+# Kurva koreksi piecewise-linear per severity: (breakpoint, slope, intercept)
+# base_adjustment = intercept + (|PMV| - breakpoint) × slope
+_CORRECTION_CURVE = (
+    (0.0, 0.0, 0.0),     # none (tidak dipakai, zona netral)
+    (0.5, 1.5, 0.5),     # mild: PMV 0.5-1.0 → 0.5 - 1.25°C
+    (1.0, 1.5, 1.25),    # moderate: PMV 1.0-1.5 → 1.25 - 2.0°C
+    (1.5, 0.67, 2.0),    # severe: PMV > 1.5 → 2.0 - 3.0°C
+)
 
+# Fan per severity (mild dengan |PMV| ≤ 0.8 → "auto", minimal intervensi)
+_FAN_BY_SEVERITY = ("auto", "low", "medium", "high")
 
-def get_thermal_severity(pmv: float) -> str:
+# Mode AC: _MODE_TABLE[pmv > 0][severity]
+_MODE_TABLE = (
+    ("fan", "fan", "dry", "fan"),        # Dingin: fan only, dry untuk transisi, kompresor mati
+    ("cool", "cool", "cool", "cool"),    # Hangat/panas: cool
+)
+
+
+def get_thermal_severity(pmv: float) -> int:
     """
     Tentukan tingkat keparahan masalah termal berdasarkan PMV.
     
-    Levels:
-    - none: PMV dalam zona netral (-0.5 to +0.5)
-    - mild: Sedikit tidak nyaman (0.5 < |PMV| ≤ 1.0)
-    - moderate: Tidak nyaman (1.0 < |PMV| ≤ 1.5)
-    - severe: Sangat tidak nyaman (|PMV| > 1.5)
+    Levels (label di SEVERITY_NAMES):
+    - SEV_NONE: PMV dalam zona netral (-0.5 to +0.5)
+    - SEV_MILD: Sedikit tidak nyaman (0.5 < |PMV| ≤ 1.0)
+    - SEV_MODERATE: Tidak nyaman (1.0 < |PMV| ≤ 1.5)
+    - SEV_SEVERE: Sangat tidak nyaman (|PMV| > 1.5)
     """
     abs_pmv = abs(pmv)
     if abs_pmv <= 0.5:
-        return "none"
+        return SEV_NONE
     elif abs_pmv <= 1.0:
-        return "mild"
+        return SEV_MILD
     elif abs_pmv <= 1.5:
-        return "moderate"
+        return SEV_MODERATE
     else:
-        return "severe"
+        return SEV_SEVERE
+
+
+def _pmv_derivatives(pmv: float) -> tuple:
+    """
+    PPD dan thermal severity dari PMV dalam satu pemanggilan.
+    
+    PPD dari core _ppd_core (AOT/JIT, sama dengan calculate_ppd). Severity tanpa
+    abs() dan tanpa branch: |PMV| > 0.5 ⇔ PMV² > 0.25, dst. (sama dengan
+    get_thermal_severity).
+    
+    Returns: (ppd, severity SEV_*)
+    """
+    ppd = _ppd_core(pmv)
+    p2 = pmv * pmv
+    severity = (p2 > 0.25) + (p2 > 1.0) + (p2 > 2.25)
+    return max(5.0, min(100.0, ppd)), severity
 
 
 def determine_ac_control(
@@ -428,7 +705,8 @@ def determine_ac_control(
     current_temp: float,
     target_temp: float,
     occupancy: int,
-    status: str
+    status_code: int,
+    thermal_severity: int
 ) -> ACControl:
     """
     Tentukan pengaturan AC dengan prinsip:
@@ -441,109 +719,78 @@ def determine_ac_control(
     - Koreksi = target_temp ± adjustment (bukan dari current_temp)
     """
     
+    # CATATAN: ACControl dibuat dengan model_construct (tanpa validasi) karena semua
+    # nilai berasal dari literal kode dan suhu sudah dalam range 16-30°C.
+    
     # Occupancy 0: Mode fan dengan suhu netral untuk efisiensi energi
     if occupancy == 0:
-        return ACControl(temp=24, mode="fan", fan="quiet")
+        return ACControl.model_construct(temp=24, mode="fan", fan="quiet")
     
     abs_pmv = abs(pmv)
-    thermal_severity = get_thermal_severity(pmv)
     
     # ===== ZONA NETRAL: PMV -0.5 sampai +0.5 =====
     # Tidak perlu koreksi, pertahankan target
-    if thermal_severity == "none":
-        return ACControl(
+    if thermal_severity == SEV_NONE:
+        return ACControl.model_construct(
             temp=int(round(target_temp)),
             mode="cool",
             fan="auto"
         )
     
     # ===== HITUNG KOREKSI BERDASARKAN THERMAL SEVERITY =====
-    # Koreksi proporsional dengan severity
-    if thermal_severity == "mild":
-        # PMV 0.5-1.0: Koreksi ringan
-        base_adjustment = 0.5 + (abs_pmv - 0.5) * 1.5  # 0.5 - 1.25°C
-    elif thermal_severity == "moderate":
-        # PMV 1.0-1.5: Koreksi moderate
-        base_adjustment = 1.25 + (abs_pmv - 1.0) * 1.5  # 1.25 - 2.0°C
-    else:  # severe
-        # PMV > 1.5: Koreksi aktif
-        base_adjustment = 2.0 + (abs_pmv - 1.5) * 0.67  # 2.0 - 3.0°C
+    # Koreksi proporsional dengan severity (lihat _CORRECTION_CURVE)
+    breakpoint_pmv, slope, intercept = _CORRECTION_CURVE[thermal_severity]
+    base_adjustment = intercept + (abs_pmv - breakpoint_pmv) * slope
     
     # ===== TERAPKAN BATAS MAKSIMUM BERDASARKAN STATUS =====
     # INI KUNCI: Optimalisasi tidak boleh koreksi lebih dari 1.5°C!
-    max_correction = STATUS_MAX_CORRECTION.get(status, 1.5)
-    temp_adjustment = min(base_adjustment, max_correction)
-    
-    # ===== TENTUKAN FAN SPEED BERDASARKAN SEVERITY DAN STATUS =====
-    # Untuk mild thermal issue: fan auto (minimal intervensi sensorik)
-    # Untuk moderate: fan low-medium
-    # Untuk severe: fan medium-high
-    if thermal_severity == "mild":
-        # PMV 0.5-0.8 → auto, PMV 0.8-1.0 → low
-        if abs_pmv <= 0.8:
-            fan_speed = "auto"  # Minimal intervensi, preventif
-        else:
-            fan_speed = "low"
-    elif thermal_severity == "moderate":
-        fan_speed = "medium"
-    else:  # severe
-        fan_speed = "high"
+    temp_adjustment = min(base_adjustment, _STATUS_MAX[status_code])
+    
+    # ===== TENTUKAN FAN SPEED BERDASARKAN SEVERITY =====
+    # mild: auto (PMV ≤ 0.8) / low, moderate: medium, severe: high
+    fan_speed = "auto" if abs_pmv <= 0.8 else _FAN_BY_SEVERITY[thermal_severity]
     
     # ===== TERAPKAN KOREKSI (TRAJECTORY-CENTRIC) =====
-    # Koreksi dihitung dari TARGET, bukan dari current_temp
-    if pmv > 0:
-        # Hangat/panas → turunkan setpoint dari target
-        ac_temp = int(round(target_temp - temp_adjustment))
-        mode = "cool"
-    else:
-        # Dingin → naikkan setpoint dari target
-        ac_temp = int(round(target_temp + temp_adjustment))
-        # Mode tergantung seberapa dingin
-        if thermal_severity == "severe":
-            mode = "fan"  # Matikan kompresor
-        elif thermal_severity == "moderate":
-            mode = "dry"  # Dry mode untuk transisi
-        else:
-            mode = "fan"  # Fan only untuk kondisi dingin ringan
+    # Koreksi dihitung dari TARGET, bukan dari current_temp:
+    # hangat (PMV > 0) → turunkan setpoint, dingin → naikkan setpoint
+    ac_temp = int(round(target_temp - math.copysign(temp_adjustment, pmv)))
+    mode = _MODE_TABLE[pmv > 0][thermal_severity]
     
     # Clamp suhu ke range operasional AC Central (16-30°C)
     ac_temp = max(16, min(30, ac_temp))
     
-    return ACControl(temp=ac_temp, mode=mode, fan=fan_speed)
+    return ACControl.model_construct(temp=ac_temp, mode=mode, fan=fan_speed)
 
 
 # ============================================================================
 # MAIN EVALUATION FUNCTION
 # ============================================================================
-def evaluate(sensor_data: SensorData) -> RuleResult:
+# Ukuran cache hasil evaluate (input berulang pada stream sensor)
+EVALUATE_CACHE_SIZE = 2048
+
+
+@lru_cache(maxsize=EVALUATE_CACHE_SIZE)
+def _evaluate_core(temp: float, hum: float, noise: float, light_level: float, occupancy: int) -> tuple:
     """
-    Evaluasi data sensor menggunakan perhitungan ISO 7730.
+    Bagian numerik evaluate() (tanpa konstruksi Comfort/RuleResult), di-cache LRU.
     
-    Flow:
-    1. Ambil target values berdasarkan occupancy
-    2. Hitung PMV menggunakan rumus Fanger
-    3. Hitung PPD dari PMV (hubungan EKSPONENSIAL!)
-    4. Tentukan status dari PPD (status = kenyamanan FISIOLOGIS)
-    5. Hitung environmental score terpisah (env_score = kualitas LINGKUNGAN)
-    6. Identifikasi masalah non-termal untuk context-aware recommendation
-    7. Tentukan AC control dengan gradual correction
-    
-    KONSEP PENTING:
-    - Status berasal dari PPD → kenyamanan fisiologis tubuh
-    - Score berasal dari env_score → kualitas lingkungan non-termal
-    - Keduanya INDEPENDEN dan tidak saling mempengaruhi
+    Returns: (pmv, ppd, status, env_score, fields) dengan fields = argumen RuleResult
+    selain comfort. Hasil cache dipakai bersama oleh semua RuleResult untuk input yang
+    sama, jadi container di dalamnya immutable (tuple / MappingProxyType).
     """
     
     # 1. Ambil reference values
-    ref = get_reference_for_occupancy(sensor_data.occupancy)
-    occ_min, occ_max, target_temp, hum_min, hum_max, target_lux, noise_max = ref
+    ref = get_reference_for_occupancy(occupancy)
+    target_temp = ref.target_temp
+    hum_min, hum_max = ref.hum_min, ref.hum_max
+    target_lux, noise_max = ref.lux, ref.noise_max
     
     # 2. Siapkan input untuk PMV calculation
     # CONSTRAINT MODEL: Asumsi ini untuk aktivitas kantor ringan, pakaian indoor standar
-    ta = sensor_data.temp  # Air temperature
+    ta = temp  # Air temperature
     tr = ta + DEFAULT_MEAN_RADIANT_TEMP_OFFSET  # Mean radiant temp (assumed = air temp)
     vel = DEFAULT_AIR_VELOCITY  # Air velocity (0.1 m/s, ventilasi normal)
-    rh = sensor_data.hum  # Relative humidity
+    rh = hum  # Relative humidity
     met = DEFAULT_METABOLIC_RATE  # Metabolic rate (1.2 met, aktivitas kantor)
     clo = DEFAULT_CLOTHING_INSULATION  # Clothing insulation (0.5 clo, pakaian indoor)
     
@@ -561,24 +808,31 @@ def evaluate(sensor_data: SensorData) -> RuleResult:
     # 3. Hitung PMV dan PPD (ISO 7730)
     # PENTING: Hubungan PMV-PPD adalah EKSPONENSIAL, bukan linear!
     # PPD = 100 - 95 × e^(-0.03353×PMV⁴ - 0.2179×PMV²)
-    pmv = calculate_pmv(ta, tr, vel, rh, met, clo)
-    ppd = calculate_ppd(pmv)
+    # Semua input selain Ta dan RH adalah DEFAULT_* → jalur terspesialisasi
+    # PPD dan thermal severity dihitung bersamaan dari PMV
+    # Dibulatkan SEKALI ke presisi output (PMV 2 desimal, PPD 1 desimal) sebelum
+    # klasifikasi, sehingga status/severity/AC konsisten dengan nilai yang dipublikasi
+    # (mis. PPD 10.0 → "Ideal").
+    pmv = round(calculate_pmv_default(ta, rh), 2)
+    ppd, thermal_severity = _pmv_derivatives(pmv)
+    ppd = round(ppd, 1)
     
     # 4. Tentukan status dari PPD
     # Status mencerminkan kenyamanan FISIOLOGIS tubuh manusia
-    status = get_status_from_ppd(ppd, sensor_data.occupancy)
+    status_code = get_status_code_from_ppd(ppd, occupancy)
+    status = STATUS_NAMES[status_code]
     
     # 5. Hitung environmental score (TERPISAH dari PMV/PPD)
     # env_score mencerminkan kualitas LINGKUNGAN (pencahayaan, kebisingan, kelembapan udara)
     env_score, env_breakdown, env_issues = calculate_env_score(
-        sensor_data.light_level, target_lux,
-        sensor_data.noise, noise_max,
-        sensor_data.hum, hum_min, hum_max
+        light_level, target_lux,
+        noise, noise_max,
+        hum, hum_min, hum_max
     )
+    env_score = round(env_score, 1)  # Presisi output; ambang score >= 80 memakai nilai ini
     
-    # 6. Tentukan primary concern dan thermal severity
-    thermal_severity = get_thermal_severity(pmv)
-    thermal_problem = thermal_severity != "none"  # Ada masalah termal jika bukan "none"
+    # 6. Tentukan primary concern (thermal severity sudah dari langkah 3)
+    thermal_problem = thermal_severity != SEV_NONE  # Ada masalah termal jika bukan "none"
     env_problem = len([i for i in env_issues if i.severity in ("moderate", "severe")]) > 0
     
     if thermal_problem and env_problem:
@@ -592,32 +846,21 @@ def evaluate(sensor_data: SensorData) -> RuleResult:
     
     # 7. Tentukan AC control dengan gradual correction
     ac_control = determine_ac_control(
-        pmv, ppd, sensor_data.temp, target_temp,
-        sensor_data.occupancy, status
+        pmv, ppd, temp, target_temp,
+        occupancy, status_code, thermal_severity
     )
     
     # 8. Hitung deviasi untuk narasi
-    temp_deviation = round(sensor_data.temp - target_temp, 1)
+    temp_deviation = round(temp - target_temp, 1)
     
-    if sensor_data.hum < hum_min:
-        hum_deviation = round(sensor_data.hum - hum_min, 1)
-    elif sensor_data.hum > hum_max:
-        hum_deviation = round(sensor_data.hum - hum_max, 1)
+    if hum < hum_min:
+        hum_deviation = round(hum - hum_min, 1)
+    elif hum > hum_max:
+        hum_deviation = round(hum - hum_max, 1)
     else:
         hum_deviation = 0.0
     
-    # 9. Build comfort object
-    # score di Comfort adalah env_score (untuk backward compatibility)
-    # CATATAN: state dari PPD, score dari env_score - keduanya INDEPENDEN
-    comfort = Comfort(
-        pmv=pmv,
-        ppd=ppd,
-        score=env_score,  # Environmental score (BUKAN determinan status)
-        state=status       # Status dari PPD (BUKAN dari score)
-    )
-    
-    return RuleResult(
-        comfort=comfort,
+    fields = dict(
         ac_control=ac_control,
         target_temp=target_temp,
         target_hum_min=hum_min,
@@ -625,11 +868,148 @@ def evaluate(sensor_data: SensorData) -> RuleResult:
         target_lux=target_lux,
         target_noise_max=noise_max,
         env_score=env_score,
-        env_score_breakdown=env_breakdown,
-        pmv_inputs=pmv_inputs,
+        env_score_breakdown=MappingProxyType(env_breakdown),
+        pmv_inputs=MappingProxyType(pmv_inputs),
         temp_deviation=temp_deviation,
         hum_deviation=hum_deviation,
-        env_issues=env_issues,
+        env_issues=tuple(env_issues),
         primary_concern=primary_concern,
-        thermal_severity=thermal_severity
+        thermal_severity=SEVERITY_NAMES[thermal_severity]
+    )
+    return pmv, ppd, status, env_score, fields
+
+
+def evaluate(sensor_data: SensorData) -> RuleResult:
+    """
+    Evaluasi data sensor menggunakan perhitungan ISO 7730.
+    
+    Flow:
+    1. Ambil target values berdasarkan occupancy
+    2. Hitung PMV menggunakan rumus Fanger
+    3. Hitung PPD dari PMV (hubungan EKSPONENSIAL!)
+    4. Tentukan status dari PPD (status = kenyamanan FISIOLOGIS)
+    5. Hitung environmental score terpisah (env_score = kualitas LINGKUNGAN)
+    6. Identifikasi masalah non-termal untuk context-aware recommendation
+    7. Tentukan AC control dengan gradual correction
+    
+    KONSEP PENTING:
+    - Status berasal dari PPD → kenyamanan fisiologis tubuh
+    - Score berasal dari env_score → kualitas lingkungan non-termal
+    - Keduanya INDEPENDEN dan tidak saling mempengaruhi
+    """
+    
+    # SensorData sudah dikuantisasi ke resolusi sensor (0.1°C, 1% RH, 1 dB, 1 lux)
+    # oleh validatornya, sehingga nilainya langsung dipakai sebagai key cache.
+    pmv, ppd, status, env_score, fields = _evaluate_core(
+        sensor_data.temp, sensor_data.hum, sensor_data.noise,
+        sensor_data.light_level, sensor_data.occupancy
+    )
+    
+    # 9. Build comfort object
+    # score di Comfort adalah env_score (untuk backward compatibility)
+    # CATATAN: state dari PPD, score dari env_score - keduanya INDEPENDEN
+    # Nilai hasil perhitungan internal (sudah dibulatkan & ter-clamp) → tanpa validasi ulang
+    comfort = Comfort.model_construct(
+        pmv=pmv,
+        ppd=ppd,
+        score=env_score,  # Environmental score (BUKAN determinan status)
+        state=status       # Status dari PPD (BUKAN dari score)
+    )
+    
+    return RuleResult(comfort=comfort, **fields)
+
+
+# ============================================================================
+# BATCH EVALUATION (banyak ruangan sekaligus)
+# ============================================================================
+# Hanya bagian numerik evaluate() dalam bentuk struct-of-arrays; teks EnvIssue,
+# AC control, dan model Pydantic tetap per ruangan lewat evaluate().
+BatchResult = namedtuple(
+    "BatchResult", ["pmv", "ppd", "status", "thermal_severity", "env_score"]
+)
+
+# Kolom REFERENCE_TABLE per occupancy (0..999) sebagai matriks untuk gather vektor
+_REF_MATRIX = np.array(_REF_BY_OCC, dtype=np.float64)
+_REF_COL = {name: i for i, name in enumerate(ReferenceRow._fields)}
+
+
+def _band_score_array(deviation: np.ndarray, bands: ScoreBands) -> np.ndarray:
+    """Versi vektor _band_score (searchsorted kiri ≡ bisect_left)."""
+    i = np.searchsorted(bands.limits, deviation, side="left")
+    banded = np.take(bands.scores + (0,), i)
+    return np.where(i < len(bands.scores), banded, np.maximum(0, 100 - deviation * bands.slope))
+
+
+def _round_array(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    Sama dengan round(v, ndigits) Python per elemen.
+    
+    np.round (skala → rint → bagi) bisa beda 1 digit untuk nilai yang berjarak
+    ~1 ulp dari titik tengah desimal; hanya elemen di dekat titik tengah itu yang
+    dibulatkan ulang dengan round() Python.
+    """
+    rounded = np.round(values, ndigits)
+    scaled = values * 10.0 ** ndigits
+    near_tie = np.flatnonzero(np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) < 1e-6)
+    for i in near_tie.tolist():
+        rounded[i] = round(float(values[i]), ndigits)
+    return rounded
+
+
+def evaluate_batch(ta_arr, rh_arr, noise_arr, lux_arr, occ_arr) -> BatchResult:
+    """
+    Versi batch evaluate() untuk deployment banyak ruangan.
+    
+    Input berupa array 1-D sejajar (satu elemen per ruangan, nilai sudah dikuantisasi
+    seperti SensorData); skalar dihitung sebagai satu ruangan. Panjang berbeda → ValueError. PMV dan PPD dihitung paralel per ruangan (kernel Numba
+    prange di rule_engine_batch); severity, status, dan env_score divektorisasi NumPy.
+    Pembulatan dan klasifikasi sama dengan evaluate().
+    
+    Returns: BatchResult berisi array; status/thermal_severity berupa kode
+    STATUS_* / SEV_* (label via STATUS_NAMES / SEVERITY_NAMES).
+    """
+    # Import lazy: Numba (dan kompilasi kernel) hanya saat batch dipakai
+    from rule_engine_batch import pmv_batch, ppd_batch
+    
+    # Skalar diperlakukan sebagai satu ruangan
+    ta = np.ascontiguousarray(np.atleast_1d(ta_arr), dtype=np.float64)
+    rh = np.ascontiguousarray(np.atleast_1d(rh_arr), dtype=np.float64)
+    noise = np.atleast_1d(np.asarray(noise_arr, dtype=np.float64))
+    lux = np.atleast_1d(np.asarray(lux_arr, dtype=np.float64))
+    occ = np.atleast_1d(np.asarray(occ_arr, dtype=np.int64))
+    
+    shapes = [x.shape for x in (ta, rh, noise, lux, occ)]
+    if any(len(shape) != 1 for shape in shapes) or len(set(shapes)) != 1:
+        raise ValueError(f"evaluate_batch expects 1-D inputs of equal length, got shapes {shapes}")
+    
+    # Pembulatan sama dengan _evaluate_core: PMV 2 desimal → PPD → PPD 1 desimal
+    pmv = _round_array(pmv_batch(ta, rh), 2)
+    ppd = _round_array(ppd_batch(pmv), 1)
+    
+    p2 = pmv * pmv
+    severity = (p2 > 0.25).astype(np.int64) + (p2 > 1.0) + (p2 > 2.25)
+    status = np.where(occ == 0, STATUS_BOROS_ENERGI, np.searchsorted(_PPD_BOUNDS, ppd, side="left"))
+    
+    # Target per ruangan (occupancy di luar tabel → baris terakhir, sama dengan get_reference_for_occupancy)
+    ref = _REF_MATRIX[np.where((occ >= 0) & (occ < len(_REF_BY_OCC)), occ, len(_REF_BY_OCC) - 1)]
+    hum_min = ref[:, _REF_COL["hum_min"]]
+    hum_max = ref[:, _REF_COL["hum_max"]]
+    
+    lux_score = _band_score_array(np.abs(lux - ref[:, _REF_COL["lux"]]), LUX_BANDS)
+    noise_score = _band_score_array(noise - ref[:, _REF_COL["noise_max"]], NOISE_BANDS)
+    hum_score = _band_score_array(np.maximum(np.maximum(hum_min - rh, rh - hum_max), 0), HUM_BANDS)
+    w_lux, w_noise, w_hum = ENV_SCORE_WEIGHTS
+    env_score = _round_array(lux_score * w_lux + noise_score * w_noise + hum_score * w_hum, 1)
+    
+    return BatchResult(pmv=pmv, ppd=ppd, status=status, thermal_severity=severity, env_score=env_score)
+
+
+def sensor_arrays(sensors) -> tuple:
+    """Ubah list SensorData menjadi array sejajar untuk evaluate_batch (sekali per batch)."""
+    return (
+        np.fromiter((s.temp for s in sensors), dtype=np.float64, count=len(sensors)),
+        np.fromiter((s.hum for s in sensors), dtype=np.float64, count=len(sensors)),
+        np.fromiter((s.noise for s in sensors), dtype=np.float64, count=len(sensors)),
+        np.fromiter((s.light_level for s in sensors), dtype=np.float64, count=len(sensors)),
+        np.fromiter((s.occupancy for s in sensors), dtype=np.int64, count=len(sensors)),
     )
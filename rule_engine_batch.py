@@ -0,0 +1,46 @@
+"""Kernel batch rule engine: PMV/PPD untuk banyak ruangan sekaligus.
+
+Dipanggil lewat rule_engine.evaluate_batch (import lazy), sehingga Numba hanya
+di-import saat batch dipakai. Fungsi modul AOT _rule_engine_native tidak bisa
+dipanggil dari kode njit, jadi core PMV/PPD Python murni di-JIT ulang di sini.
+Tanpa Numba: njit no-op dan prange = range (loop Python biasa, hasil sama).
+
+Pembulatan (round() Python, sama dengan evaluate()) dilakukan oleh pemanggil di
+antara kedua kernel: round() Numba/NumPy bisa berbeda 1 digit untuk nilai yang
+berjarak 1 ulp dari titik tengah desimal.
+"""
+import numpy as np
+
+from rule_engine import PMV_DEFAULT_CORE_SIG, PPD_CORE_SIG, _pmv_default_core_py, _ppd_core_py
+
+try:
+    from numba import njit, prange
+except ImportError:  # Numba opsional
+    def njit(*args, **kwargs):
+        """Pengganti no-op untuk numba.njit."""
+        return lambda func: func
+    prange = range
+
+
+_pmv_default_core = njit(PMV_DEFAULT_CORE_SIG, cache=True, fastmath=True)(_pmv_default_core_py)
+_ppd_core = njit(PPD_CORE_SIG, cache=True, fastmath=True)(_ppd_core_py)
+
+
+@njit(parallel=True, cache=True)
+def pmv_batch(ta, rh):
+    """PMV (ter-clamp, belum dibulatkan) per ruangan, paralel antar ruangan (prange)."""
+    n = ta.shape[0]
+    pmv = np.empty(n)
+    for i in prange(n):
+        pmv[i] = max(-3.0, min(3.0, _pmv_default_core(ta[i], rh[i])))
+    return pmv
+
+
+@njit(parallel=True, cache=True)
+def ppd_batch(pmv):
+    """PPD (ter-clamp, belum dibulatkan) dari PMV yang sudah dibulatkan."""
+    n = pmv.shape[0]
+    ppd = np.empty(n)
+    for i in prange(n):
+        ppd[i] = max(5.0, min(100.0, _ppd_core(pmv[i])))
+    return ppd
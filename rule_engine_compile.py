@@ -0,0 +1,25 @@
+"""Build modul AOT _rule_engine_native untuk core numerik rule_engine (numba.pycc).
+
+Jalankan sekali saat build/deploy:
+    python rule_engine_compile.py
+
+Hasilnya (_rule_engine_native*.so) otomatis dipakai rule_engine.py sehingga
+tidak ada kompilasi JIT saat startup. Build ulang setiap kali rumus PMV/PPD
+atau konstanta DEFAULT_* di rule_engine.py berubah.
+"""
+import os
+from numba.pycc import CC
+
+import rule_engine
+
+
+cc = CC("_rule_engine_native")
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+cc.export("pmv_core", rule_engine.PMV_CORE_SIG)(rule_engine._pmv_core_py)
+cc.export("pmv_default_core", rule_engine.PMV_DEFAULT_CORE_SIG)(rule_engine._pmv_default_core_py)
+cc.export("ppd_core", rule_engine.PPD_CORE_SIG)(rule_engine._ppd_core_py)
+
+
+if __name__ == "__main__":
+    cc.compile()